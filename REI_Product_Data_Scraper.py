@@ -1,31 +1,116 @@
 from __future__ import annotations
 
 # ========== Imports ==========
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
 import json
-import random
+import math
+import os
+import queue
+import re
+import socket
+import sqlite3
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, IO, Iterator, List, Mapping, NamedTuple, Optional, Tuple
 
 import requests
 from bs4 import BeautifulSoup
 from DrissionPage import ChromiumPage
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import zstandard  # optional: only needed for --compress zstd
+except ImportError:
+    zstandard = None
+
+try:
+    import aiohttp  # optional: only needed for --engine async
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson  # optional: faster JSON encode/decode, stdlib json otherwise
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # optional: only needed for --parquet
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 
 
 # ========== Constants & Headers ==========
-LISTING_URL_TMPL = "https://www.rei.com/c/womens-t-shirts?json=true&page={}"
+LISTING_URL_TMPL = "https://www.rei.com/c/{}?json=true&page={}"
+CATEGORIES = ["womens-t-shirts"]   # category slugs crawled by default
+PDP_URL_TMPL = "https://www.rei.com/product/{}"
 BASE_URL = "https://www.rei.com"
 
 PRODUCT_IPS = "product_ids.json"
 OUTPUT_PRODUCT_DATA = 'extracted_product_data.json'
-
-TARGET_COUNT = 90         
+OUTPUT_PRODUCT_STREAM = 'extracted_product_data.jsonl'
+STREAM_FLUSH_EVERY = 50    # records between explicit flushes of the JSONL stream
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+PARQUET_BATCH = 1000       # products per Parquet part file (their SKUs go in the same flush)
+STATE_DB = "crawl_state.sqlite3"
+CHANGE_FEED = "product_changes.jsonl"
+CACHE_DIR = "response_cache"
+CACHE_TTL = 24 * 3600      # seconds a cached response is served instead of refetching it
+PDP_MAX_ATTEMPTS = 3       # runs a failing PDP is retried before it is left as failed
+QUEUE_DB = "work_queue.sqlite3"
+LEASE_SIZE = 25            # prodIds a worker takes per lease
+LEASE_TIMEOUT = 300.0      # seconds before an unrenewed lease goes back on the queue
+QUEUE_POLL = 2.0           # seconds between polls of an empty queue
+
+TARGET_COUNT = 90          # 0 = no cap (full catalog)
 MAX_WORKERS  = 8          
 MAX_EMPTY_PAGES = 3        
 REQUEST_TIMEOUT = (5, 20)  
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PDP_MODE = "http"          # "http" (pooled session, browser fallback) or "browser"
+PDP_WORKERS = 8
+NORMALIZE_PROCESSES = max(1, (os.cpu_count() or 2) - 1)   # 0 = normalize inline in the fetch loop
+NORMALIZE_MAX_PENDING = 64 # modelData blobs queued for or inside the process pool
+BROWSER_TABS = 4           # concurrent Chromium tabs when the browser is needed
+BROWSER_MAX_ATTEMPTS = 2
+BROWSER_RESTARTS = 2       # times a crashed browser is relaunched before the remaining PDPs are given up
+
+# Shared request budget (requests/second), adapted AIMD-style
+RATE_INITIAL = 4.0
+RATE_MIN = 0.2
+RATE_MAX = 20.0
+RATE_BURST = 4             # tokens the bucket can hold
+RATE_INCREASE = 0.5        # req/s added per second of healthy traffic
+RATE_DECREASE = 0.5        # multiplier applied on 429/503
+RATE_COOLDOWN = 2.0        # seconds between two multiplicative cuts
+THROTTLE_STATUSES = {429, 503}
+
+# Identity pool (--identities / --proxies)
+BLOCK_STATUSES = {403, 429}  # answers that count against an identity's health
+IDENTITY_BENCH_AFTER = 3   # consecutive blocked answers before an identity is benched
+IDENTITY_BENCH_SECONDS = 120.0   # first bench; doubles each time the identity is benched again
+IDENTITY_BENCH_MAX = 1800.0
+IDENTITY_SWITCHES = 3      # identities one request may try after being blocked
+IDENTITY_HEALTH_PENALTY = 1.0   # seconds of extra wait an identity at health 0 counts as when picking
+
+# Asyncio engine (--engine async)
+ASYNC_CONCURRENCY = 200    # requests in flight on the event loop
+ASYNC_PER_HOST = 64        # open connections per host
+METRICS_INTERVAL = 15.0    # seconds between --metrics-json snapshots
+METRICS_HOST = "127.0.0.1" # --metrics-port listens here only; --metrics-host 0.0.0.0 exposes it
 
 HEADERS = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
@@ -43,21 +128,420 @@ HEADERS = {
     "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139 Safari/537.36",
 }
 
-# ========== Small Utilities ==========
-def random_sleep(min_seconds=5, max_seconds=8):
-    sleep_duration = random.uniform(min_seconds, max_seconds)
-    print(f"Sleeping for {sleep_duration:.2f} seconds...")
-    time.sleep(sleep_duration)
+# ========== Metrics ==========
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)   # seconds
+METRICS_PREFIX = "rei_"
+METRIC_HELP = {
+    "request_seconds": "HTTP request latency (the requests engine includes its transport retries)",
+    "responses_total": "HTTP responses by final status",
+    "request_errors_total": "HTTP requests that raised (connection errors, timeouts)",
+    "retries_total": "retried attempts by status (or 'error')",
+    "response_bytes_total": "response body bytes received",
+    "listing_pages_total": "listing pages by result (ids, empty, error)",
+    "sleep_seconds_total": "time spent sleeping, by reason",
+    "stage_seconds_total": "time spent per pipeline stage",
+    "stage_calls_total": "calls per pipeline stage",
+    "queue_depth": "current depth of a work queue or in-flight window",
+    "cache_lookups_total": "response cache lookups by kind and result (hit, miss)",
+    "queue_tasks_total": "work-queue task outcomes (leased, done, retried, failed, expired, stale)",
+    "identity_responses_total": "responses per pool identity by status (or 'error')",
+    "identity_benched_total": "times a pool identity was benched for repeated 403/429",
+    "identity_health": "health score of a pool identity (1 = healthy)",
+    "ratings_walks_total": "full modelData walks to locate a review summary",
+    "ratings_walks_avoided_total": "review-summary lookups answered by a path learned per template",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def metric_key(name: str, labels: LabelKey) -> str:
+    return name + ("{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else "")
+
+def metric_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class StageTimer:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics, self.stage = metrics, stage
+
+    def __enter__(self) -> "StageTimer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.stage_done(self.stage, time.perf_counter() - self.t0)
+
+class Metrics:
+    """Thread-safe counters, latency histograms and gauges; pool workers `drain()`, the parent `merge()`s."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._hists: Dict[str, Dict[LabelKey, List[float]]] = {}   # bucket counts..., +Inf, sum
+        self._gauges: Dict[str, Dict[LabelKey, List[float]]] = {}  # [current, max]
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            h = self._hists.setdefault(name, {}).get(key)
+            if h is None:
+                h = self._hists[name][key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(LATENCY_BUCKETS)] += 1
+            h[-1] += value
+
+    def gauge(self, name: str, value: float, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            g = self._gauges.setdefault(name, {}).setdefault(key, [0.0, 0.0])
+            g[0] = value
+            g[1] = max(g[1], value)
+
+    def timer(self, stage: str) -> StageTimer:
+        return StageTimer(self, stage)
+
+    def stage_done(self, stage: str, seconds: float) -> None:
+        self.inc("stage_seconds_total", seconds, stage=stage)
+        self.inc("stage_calls_total", stage=stage)
+
+    def request(self, stage: str, seconds: float, status: Optional[int], nbytes: int = 0) -> None:
+        """One HTTP attempt: latency, status and body size."""
+        self.observe("request_seconds", seconds, stage=stage)
+        self.inc("responses_total", stage=stage, status=status)
+        if nbytes:
+            self.inc("response_bytes_total", nbytes, stage=stage)
+
+    def drain(self) -> Tuple[Dict[str, Dict[LabelKey, float]], Dict[str, Dict[LabelKey, List[float]]]]:
+        """Counters and histograms recorded since the last drain, resetting them."""
+        with self._lock:
+            out = (self._counters, self._hists)
+            self._counters, self._hists = {}, {}
+        return out
+
+    def merge(self, drained: Tuple[Dict[str, Dict[LabelKey, float]], Dict[str, Dict[LabelKey, List[float]]]]) -> None:
+        counters, hists = drained
+        with self._lock:
+            for name, series in counters.items():
+                mine = self._counters.setdefault(name, {})
+                for key, value in series.items():
+                    mine[key] = mine.get(key, 0) + value
+            for name, series in hists.items():
+                mine = self._hists.setdefault(name, {})
+                for key, h in series.items():
+                    cur = mine.setdefault(key, [0.0] * len(h))
+                    for i, v in enumerate(h):
+                        cur[i] += v
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly copy of every series."""
+        with self._lock:
+            hists = {}
+            for name, series in self._hists.items():
+                for key, h in series.items():
+                    hists[metric_key(name, key)] = {
+                        "count": int(sum(h[:-1])), "sum": round(h[-1], 6),
+                        "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], map(int, h[:-1]))),
+                    }
+            return {
+                "time": time.time(),
+                "counters": {metric_key(n, k): v for n, series in self._counters.items() for k, v in series.items()},
+                "histograms": hists,
+                "gauges": {metric_key(n, k): {"value": g[0], "max": g[1]}
+                           for n, series in self._gauges.items() for k, g in series.items()},
+            }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines += [f"# HELP {METRICS_PREFIX}{name} {METRIC_HELP.get(name, name)}",
+                          f"# TYPE {METRICS_PREFIX}{name} counter"]
+                lines += [f"{metric_key(METRICS_PREFIX + name, k)} {metric_value(v)}" for k, v in sorted(series.items())]
+            for name, series in sorted(self._hists.items()):
+                lines += [f"# HELP {METRICS_PREFIX}{name} {METRIC_HELP.get(name, name)}",
+                          f"# TYPE {METRICS_PREFIX}{name} histogram"]
+                for key, h in sorted(series.items()):
+                    cumulative = 0.0
+                    for bound, n in zip([f"{b:g}" for b in LATENCY_BUCKETS] + ["+Inf"], h[:-1]):
+                        cumulative += n
+                        lines.append(f"{metric_key(METRICS_PREFIX + name + '_bucket', key + (('le', bound),))} "
+                                     f"{metric_value(cumulative)}")
+                    lines.append(f"{metric_key(METRICS_PREFIX + name + '_sum', key)} {metric_value(h[-1])}")
+                    lines.append(f"{metric_key(METRICS_PREFIX + name + '_count', key)} {metric_value(cumulative)}")
+            for name, series in sorted(self._gauges.items()):
+                lines += [f"# HELP {METRICS_PREFIX}{name} {METRIC_HELP.get(name, name)}",
+                          f"# TYPE {METRICS_PREFIX}{name} gauge"]
+                lines += [f"{metric_key(METRICS_PREFIX + name, k)} {metric_value(g[0])}" for k, g in sorted(series.items())]
+        return "\n".join(lines) + "\n"
+
+    def quantile(self, name: str, q: float, **labels: Any) -> Optional[float]:
+        """Upper bucket bound holding the q-quantile (None without samples; inf past the last bucket)."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            h = self._hists.get(name, {}).get(key)
+            if not h:
+                return None
+            total = sum(h[:-1])
+            seen = 0.0
+            for bound, n in zip(LATENCY_BUCKETS + (math.inf,), h[:-1]):
+                seen += n
+                if total and seen >= q * total:
+                    return bound
+        return None
+
+    def summary(self) -> List[str]:
+        """End-of-run report lines: where the time went, requests, retries, sleeps and queue peaks."""
+        snap = self.snapshot()
+        with self._lock:
+            c = {name: dict(series) for name, series in self._counters.items()}
+            request_keys = sorted(self._hists.get("request_seconds", {}))
+        lines = []
+        stages = c.get("stage_seconds_total", {})
+        calls = c.get("stage_calls_total", {})
+        for key, seconds in sorted(stages.items(), key=lambda kv: -kv[1]):
+            n = calls.get(key, 0)
+            lines.append(f"  stage {dict(key)['stage']:<13} {seconds:9.2f}s  {int(n):>7} calls  "
+                         f"{1000 * seconds / n if n else 0:8.2f} ms avg")
+        for key in request_keys:
+            stage = dict(key)["stage"]
+            statuses = {dict(k)["status"]: int(v) for k, v in c.get("responses_total", {}).items()
+                        if dict(k)["stage"] == stage}
+            p50, p95 = self.quantile("request_seconds", 0.5, stage=stage), self.quantile("request_seconds", 0.95, stage=stage)
+            mb = c.get("response_bytes_total", {}).get((("stage", stage),), 0) / 1e6
+            lines.append(f"  {stage} requests: p50 <= {p50:g}s, p95 <= {p95:g}s, {mb:.1f} MB, statuses {statuses}")
+        for name in ("retries_total", "request_errors_total", "listing_pages_total", "sleep_seconds_total"):
+            series = {",".join(v for _, v in k) or "all": round(v, 2) for k, v in c.get(name, {}).items()}
+            if series:
+                lines.append(f"  {name}: {series}")
+        walks = sum(c.get("ratings_walks_total", {}).values())
+        avoided = sum(c.get("ratings_walks_avoided_total", {}).values())
+        if walks or avoided:
+            lines.append(f"  ratings lookup: {int(walks)} full-tree walks, {int(avoided)} avoided via learned paths")
+        for key, g in snap["gauges"].items():
+            if key.startswith("queue_depth"):
+                lines.append(f"  peak {key}: {g['max']:g}")
+        return lines
+
+METRICS = Metrics()
+
+def serve_metrics(port: int, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Serve METRICS at http://<host>:<port>/metrics (Prometheus) and /metrics.json from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(METRICS.snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = METRICS.prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class MetricsSnapshotter:
+    """Rewrites a JSON snapshot of METRICS every `interval` seconds (and once more on stop)."""
+
+    def __init__(self, path: str, interval: float = METRICS_INTERVAL):
+        self.path, self.interval = path, interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(METRICS.snapshot(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+
+# ========== Rate Limiting ==========
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP date) -> seconds to wait."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """Thread-safe AIMD token bucket: `acquire()` before each request, `record()` its status after."""
+
+    def __init__(self, rate: float = RATE_INITIAL, min_rate: float = RATE_MIN, max_rate: Optional[float] = None,
+                 burst: int = RATE_BURST, increase: float = RATE_INCREASE, decrease: float = RATE_DECREASE,
+                 cooldown: float = RATE_COOLDOWN):
+        if max_rate is None:
+            max_rate = max(RATE_MAX, rate)
+        elif rate > max_rate:
+            print(f"Requested rate {rate:g} req/s is above the {max_rate:g} req/s ceiling; starting at the ceiling")
+        self.min_rate, self.max_rate = min_rate, max_rate
+        self.burst, self.increase, self.decrease, self.cooldown = burst, increase, decrease, cooldown
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._last_cut = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current request budget in requests/second."""
+        with self._lock:
+            return self._rate
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    def _try_take(self, take: bool = True) -> float:
+        """Take a token and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= take
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+    def wait_time(self) -> float:
+        """Seconds until a request could be sent, without taking a token."""
+        return self._try_take(take=False)
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self._try_take()
+            if not delay:
+                if waited:
+                    METRICS.inc("sleep_seconds_total", waited, reason="rate_limit")
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self) -> float:
+        """`acquire` for coroutines: waits on the event loop instead of blocking a thread."""
+        waited = 0.0
+        while True:
+            delay = self._try_take()
+            if not delay:
+                if waited:
+                    METRICS.inc("sleep_seconds_total", waited, reason="rate_limit")
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def record(self, status: Optional[int], retry_after: Optional[str] = None) -> None:
+        """Feed one response status (and Retry-After header) back into the rate."""
+        with self._lock:
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                if now - self._last_cut >= self.cooldown:
+                    self._rate = max(self.min_rate, self._rate * self.decrease)
+                    self._last_cut = now
+                    self._refill(now)
+                    self._tokens = min(self._tokens, 0.0)
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    self._paused_until = max(self._paused_until, now + delay)
+            elif status is not None and status < 400:
+                self._rate = min(self.max_rate, self._rate + self.increase / self._rate)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {"rate": round(self._rate, 3), "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3)}
+
+class LimiterRetry(Retry):
+    """urllib3 Retry that also reports every retried status to a RateLimiter."""
+
+    def __init__(self, *args, limiter: Optional[RateLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if self.limiter is not None and response is not None:
+            self.limiter.record(response.status, response.headers.get("Retry-After"))
+        METRICS.inc("retries_total", reason=response.status if response is not None else "error")
+        return super().increment(method, url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace)
+
+    def sleep(self, response=None) -> None:
+        t0 = time.perf_counter()
+        super().sleep(response)
+        METRICS.inc("sleep_seconds_total", time.perf_counter() - t0, reason="retry_backoff")
 
-def make_session(pool_size: int) -> requests.Session:
-    """Create a pooled session with retries/backoff."""
+
+# ========== Small Utilities ==========
+def loads_json(text: Any) -> Any:
+    """json.loads through orjson when installed; inputs orjson rejects (NaN, huge ints) fall back to stdlib."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+def dumps_json(obj: Any) -> str:
+    """Compact JSON text, through orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"))
+
+def make_session(pool_size: int, limiter: Optional[RateLimiter] = None,
+                 retry_statuses: Tuple[int, ...] = RETRY_STATUSES) -> requests.Session:
+    """Create a pooled session with retries/backoff (retries feed `limiter` if given)."""
     s = requests.Session()
-    retry = Retry(
-        total=5,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
+    retry = LimiterRetry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=list(retry_statuses),
         allowed_methods=["GET"],
         raise_on_status=False,
+        limiter=limiter,
     )
     adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
     s.mount("https://", adapter)
@@ -65,6 +549,138 @@ def make_session(pool_size: int) -> requests.Session:
     s.headers.update(HEADERS)
     return s
 
+
+# ========== Session Pool (identities, proxies, health) ==========
+class Identity:
+    """One client identity (headers, proxy, connection pool, rate budget) with a health score and a bench timer."""
+
+    def __init__(self, name: str, headers: Optional[Dict[str, str]] = None, proxy: Optional[str] = None,
+                 rate: float = RATE_INITIAL, pool_size: int = MAX_WORKERS + 4):
+        self.name = name
+        self.proxy = proxy
+        self.limiter = RateLimiter(rate=rate)
+        # Blocked answers are not retried on the same identity; the pool moves the request to another one
+        self.session = make_session(pool_size, self.limiter,
+                                    tuple(s for s in RETRY_STATUSES if s not in BLOCK_STATUSES))
+        if headers:
+            self.session.headers.update(headers)
+        if proxy:
+            self.session.proxies.update({"http": proxy, "https": proxy})
+        self.health = 1.0
+        self.blocked_streak = 0
+        self.error_streak = 0
+        self.times_benched = 0
+        self.benched_until = 0.0
+        self.requests = 0
+        self.last_used = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"identity": self.name, "health": round(self.health, 3), "requests": self.requests,
+                "times_benched": self.times_benched, "benched_for": round(max(0.0, self.benched_until - time.monotonic()), 1),
+                **self.limiter.snapshot()}
+
+def load_identities(path: Optional[str] = None, proxies: Optional[List[str]] = None,
+                    pool_size: int = MAX_WORKERS + 4, rate: float = RATE_INITIAL) -> List[Identity]:
+    """Identities from a JSON list of {name, headers, user_agent, proxy, rate} objects, plus one per proxy URL."""
+    specs: List[Dict[str, Any]] = []
+    if path:
+        with open(path, encoding="utf-8") as f:
+            specs.extend(json.load(f))
+    specs.extend({"proxy": proxy} for proxy in proxies or [])
+    identities = []
+    for i, spec in enumerate(specs):
+        headers = dict(spec.get("headers") or {})
+        if spec.get("user_agent"):
+            headers["user-agent"] = spec["user_agent"]
+        identities.append(Identity(spec.get("name") or spec.get("proxy") or f"identity-{i}", headers,
+                                   spec.get("proxy"), spec.get("rate", rate), pool_size))
+    return identities
+
+class SessionPool:
+    """Stands in for a requests.Session: each GET goes to the healthy identity that can send soonest."""
+
+    def __init__(self, identities: List[Identity], bench_after: int = IDENTITY_BENCH_AFTER,
+                 bench_seconds: float = IDENTITY_BENCH_SECONDS, switches: int = IDENTITY_SWITCHES):
+        if not identities:
+            raise ValueError("a session pool needs at least one identity")
+        self.identities = identities
+        self.bench_after = bench_after
+        self.bench_seconds = bench_seconds
+        self.switches = switches
+        self._lock = threading.Lock()
+
+    def pick(self, exclude: Tuple[Identity, ...] = ()) -> Identity:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [i for i in self.identities if i not in exclude] or self.identities
+                ready = [i for i in candidates if i.benched_until <= now]
+                if ready:
+                    # An unhealthy identity counts as busier, so it gets traffic only when the rest are saturated
+                    identity = min(ready, key=lambda i: (i.limiter.wait_time() + (1 - i.health) * IDENTITY_HEALTH_PENALTY,
+                                                         i.last_used))
+                    identity.last_used = now
+                    return identity
+                wait_for = min(i.benched_until for i in candidates) - now
+            METRICS.inc("sleep_seconds_total", wait_for, reason="identities_benched")
+            time.sleep(wait_for)
+
+    def _bench(self, identity: Identity, reason: str) -> None:
+        bench = min(IDENTITY_BENCH_MAX, self.bench_seconds * 2 ** identity.times_benched)
+        identity.benched_until = time.monotonic() + bench
+        identity.times_benched += 1
+        identity.blocked_streak = identity.error_streak = 0
+        METRICS.inc("identity_benched_total", identity=identity.name)
+        print(f"🪑 Identity {identity.name} benched for {bench:.0f}s after repeated {reason}")
+
+    def report(self, identity: Identity, status: Optional[int]) -> None:
+        with self._lock:
+            identity.requests += 1
+            if status in BLOCK_STATUSES:
+                identity.health *= 0.5
+                identity.blocked_streak += 1
+                if identity.blocked_streak >= self.bench_after:
+                    self._bench(identity, f"{status}s")
+            elif status is None:
+                identity.health *= 0.8
+                identity.error_streak += 1
+                if identity.error_streak >= self.bench_after:
+                    self._bench(identity, "connection errors")
+            elif status >= 500:
+                identity.health *= 0.8
+            else:
+                identity.health += (1.0 - identity.health) * 0.2
+                identity.blocked_streak = identity.error_streak = 0
+            health = identity.health
+        METRICS.inc("identity_responses_total", identity=identity.name, status=status if status else "error")
+        METRICS.gauge("identity_health", health, identity=identity.name)
+
+    def get(self, url: str, timeout: Any = REQUEST_TIMEOUT, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        tried: Tuple[Identity, ...] = ()
+        moved_after_error = False
+        while True:
+            identity = self.pick(tried)
+            identity.limiter.acquire()
+            try:
+                r = identity.session.get(url, timeout=timeout, headers=headers)
+            except requests.RequestException:
+                self.report(identity, None)
+                tried += (identity,)
+                # Likely the identity's proxy, not the URL: one more try on a different identity
+                if moved_after_error or len(tried) >= len(self.identities):
+                    raise
+                moved_after_error = True
+                continue
+            identity.limiter.record(r.status_code, r.headers.get("Retry-After"))
+            self.report(identity, r.status_code)
+            tried += (identity,)
+            if r.status_code not in BLOCK_STATUSES or len(tried) > self.switches:
+                return r
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [identity.snapshot() for identity in self.identities]
+
 # ========== Product-ID Collection ==========
 def parse_prod_ids(payload: dict) -> List[str]:
     """Extract prodId strings from a search JSON payload."""
@@ -76,67 +692,349 @@ def parse_prod_ids(payload: dict) -> List[str]:
             ids.append(str(pid))
     return ids
 
-def fetch_page(session: requests.Session, page_number: int) -> List[str]:
-    """Fetch one page and return the prodIds found."""
-    # Tiny jitter helps avoid thundering herd patterns
-    time.sleep(random.uniform(0.02, 0.12))
-    url = LISTING_URL_TMPL .format(page_number)
-    r = session.get(url, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        return []
+def listing_number(item: Dict[str, Any], *paths: Tuple[str, ...]) -> Optional[float]:
+    """First numeric value among `paths` of a listing item ({"value": n} wrappers and numeric strings accepted)."""
+    for path in paths:
+        val = deep_get(item, list(path))
+        if isinstance(val, dict):
+            val = val.get("value")
+        if isinstance(val, str):
+            try:
+                val = float(val.replace("$", "").replace(",", ""))
+            except ValueError:
+                continue
+        if isinstance(val, (int, float)) and not isinstance(val, bool):
+            return float(val)
+    return None
+
+def listing_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Price/sale/rating/availability of a searchResults item; None = not given, [] = no sale (clear it)."""
+    regular = listing_number(item, ("regularPrice",), ("displayPrice", "compareAt"), ("price", "compareAt"),
+                             ("displayPrice", "regularPrice"))
+    low = listing_number(item, ("salePrice",), ("displayPrice", "min"), ("price", "min"), ("displayPrice", "price"))
+    high = listing_number(item, ("displayPrice", "max"), ("price", "max")) or low
+    flags = [item[k] for k in ("sale", "onSale", "clearance") if isinstance(item.get(k), bool)]
+    if regular is None and low is not None and not any(flags):
+        regular = high  # a single displayed price with no sale flag is the regular price
+    priced = regular is not None and low is not None
+    on_sale = (any(flags) or (priced and low < regular)) if (flags or priced) else None
+    pct = listing_number(item, ("percentageOff",), ("percentOff",), ("savingsPercentage",))
+    available = next((item[k] for k in ("available", "isAvailable", "inStock") if isinstance(item.get(k), bool)), None)
+    reviews = listing_number(item, ("reviewCount",), ("reviewsCount",), ("reviewSummary", "count"))
+    return {
+        "price": {
+            "regularPrice": regular,
+            "salePriceRange": ([low, high] if on_sale and low is not None else []) if on_sale is not None else None,
+            "isOnSale": on_sale,
+            "savingsPercentage": [int(round(pct))] if pct else ([] if on_sale is False else None),
+        },
+        "ratings": {
+            "averageRating": listing_number(item, ("rating",), ("averageRating",), ("reviewSummary", "averageRating")),
+            "reviewCount": int(reviews) if reviews is not None else None,
+        },
+        "available": available,
+    }
+
+def parse_listing_items(payload: dict) -> Dict[str, Dict[str, Any]]:
+    """prodId -> listing_fields for every item of a search JSON payload."""
+    results = payload.get("searchResults", {}).get("results", []) or []
+    return {str(item["prodId"]): listing_fields(item) for item in results if isinstance(item, dict) and item.get("prodId")}
+
+def hash_listing_fields(fields: Dict[str, Any]) -> str:
+    return hashlib.blake2b(json.dumps(fields, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+def parse_page_count(payload: dict) -> Optional[int]:
+    """Number of listing pages, from the total-results / page-size metadata of a search payload."""
+    sr = payload.get("searchResults") or {}
+    scopes = [d for d in (sr, sr.get("pagination"), sr.get("query"), payload.get("pagination")) if isinstance(d, dict)]
+
+    def first_int(keys: Tuple[str, ...]) -> Optional[int]:
+        for scope in scopes:
+            for key in keys:
+                val = scope.get(key)
+                if isinstance(val, (int, float)) and not isinstance(val, bool) and val >= 0:
+                    return int(val)
+                if isinstance(val, str) and val.isdigit():
+                    return int(val)
+        return None
+
+    pages = first_int(("totalPages", "pageCount", "numPages"))
+    if pages is not None:
+        return pages
+    total = first_int(("total", "totalResults", "totalCount", "resultCount", "numFound"))
+    if total is None:
+        return None
+    size = first_int(("pageSize", "resultsPerPage", "size", "rows")) or len(sr.get("results") or [])
+    if not size:
+        return 0 if total == 0 else None
+    return math.ceil(total / size)
+
+def limited_get(session: requests.Session, url: str, limiter: Optional[RateLimiter],
+                headers: Optional[Dict[str, str]] = None, stage: str = "http") -> requests.Response:
+    """GET `url` inside the shared rate budget and report the outcome back to it (and to METRICS)."""
+    if limiter is not None:
+        limiter.acquire()
+    t0 = time.perf_counter()
     try:
-        data = r.json()
+        r = session.get(url, timeout=REQUEST_TIMEOUT, headers=headers)
+    except requests.RequestException:
+        METRICS.stage_done("fetch", time.perf_counter() - t0)
+        METRICS.inc("request_errors_total", stage=stage)
+        raise
+    elapsed = time.perf_counter() - t0
+    METRICS.stage_done("fetch", elapsed)
+    METRICS.request(stage, elapsed, r.status_code, len(r.content))
+    if limiter is not None:
+        limiter.record(r.status_code, r.headers.get("Retry-After"))
+    return r
+
+def listing_url(category: str, page_number: int) -> str:
+    return LISTING_URL_TMPL.format(category, page_number)
+
+ListingItems = Optional[Dict[str, Dict[str, Any]]]
+
+def fetch_listing(session: requests.Session, page_number: int, limiter: Optional[RateLimiter] = None,
+                  category: str = CATEGORIES[0], cache: Optional[ResponseCache] = None,
+                  items: ListingItems = None) -> Tuple[List[str], Optional[int]]:
+    """Fetch one page (or take it from `cache`); return (prodIds found, total page count if the payload says)."""
+    url = listing_url(category, page_number)
+    cached = cache.get(url) if cache else None
+    if cached is not None:
+        return listing_result(category, page_number, 200, cached.text, items)
+    r = limited_get(session, url, limiter, stage="listing")
+    return listing_response(cache, category, page_number, r.status_code, r.text, items)
+
+def listing_response(cache: Optional[ResponseCache], category: str, page_number: int, status: int, body: str,
+                     items: ListingItems = None) -> Tuple[List[str], Optional[int]]:
+    """Cache a freshly fetched listing page (200s only) and parse it; shared by both engines."""
+    if cache and status == 200:
+        cache.put(listing_url(category, page_number), "listing", f"{category}/{page_number}", body)
+    return listing_result(category, page_number, status, body, items)
+
+def listing_result(category: str, page_number: int, status: int, body: str,
+                   items: ListingItems = None) -> Tuple[List[str], Optional[int]]:
+    """Parse one listing response (failed pages counted apart from empty ones), filling `items` if given."""
+    if status != 200:
+        METRICS.inc("listing_pages_total", result="error")
+        print(f"Listing {category} page {page_number}: HTTP {status}")
+        return [], None
+    try:
+        data = loads_json(body)
     except ValueError:
-        return []
-    return parse_prod_ids(data)
+        METRICS.inc("listing_pages_total", result="error")
+        print(f"Listing {category} page {page_number}: response is not JSON")
+        return [], None
+    ids = parse_prod_ids(data)
+    METRICS.inc("listing_pages_total", result="ids" if ids else "empty")
+    if items is not None:
+        items.update(parse_listing_items(data))
+    return ids, parse_page_count(data)
+
+def fetch_page(session: requests.Session, page_number: int, limiter: Optional[RateLimiter] = None,
+               category: str = CATEGORIES[0]) -> List[str]:
+    """Fetch one page and return the prodIds found."""
+    return fetch_listing(session, page_number, limiter, category)[0]
+
+class CategoryCursor:
+    """Pagination position and end-of-listing detection for one category; its first page is a probe."""
+
+    __slots__ = ("slug", "next_page", "empty_streak", "done", "probing", "probe_sent", "last_page", "in_flight")
+
+    def __init__(self, slug: str, start_page: int = 1):
+        self.slug = slug
+        self.next_page = start_page
+        self.empty_streak = 0
+        self.done = False
+        self.probing = True
+        self.probe_sent = False
+        self.last_page: Optional[int] = None
+        self.in_flight = 0
+
+class CrawlFrontier:
+    """Hands out listing pages of many categories round-robin, ending each category on its own."""
+
+    def __init__(self, categories: List[str], start_page: int = 1, max_empty: int = MAX_EMPTY_PAGES,
+                 skip_urls: Optional[set] = None):
+        self.max_empty = max_empty
+        self.skip_urls = skip_urls or set()
+        self.cursors = {slug: CategoryCursor(slug, start_page) for slug in dict.fromkeys(categories)}
+        self._rotation = deque(self.cursors.values())
+        self.requested = self.empty = self.planned = 0
+
+    def next_page(self) -> Optional[Tuple[str, int]]:
+        """Next (category, page) to fetch, rotating across live categories; None if nothing is ready."""
+        for _ in range(len(self._rotation)):
+            cursor = self._rotation.popleft()
+            if cursor.done:
+                continue
+            self._rotation.append(cursor)
+            if cursor.probing and cursor.probe_sent:
+                continue  # wait for the probe before planning the rest
+            if cursor.last_page is None and cursor.in_flight >= self.max_empty:
+                continue
+            while listing_url(cursor.slug, cursor.next_page) in self.skip_urls:
+                cursor.next_page += 1
+            if cursor.last_page is not None and cursor.next_page > cursor.last_page:
+                cursor.done = True
+                continue
+            page = cursor.next_page
+            cursor.next_page += 1
+            cursor.probe_sent = True
+            cursor.in_flight += 1
+            self.requested += 1
+            return cursor.slug, page
+        return None
+
+    def report(self, category: str, found_ids: bool, page_count: Optional[int] = None) -> None:
+        cursor = self.cursors[category]
+        cursor.in_flight -= 1
+        if not found_ids:
+            self.empty += 1
+        if cursor.probing:
+            cursor.probing = False
+            if page_count is not None:
+                cursor.last_page = page_count
+                self.planned += 1
+        if cursor.last_page is not None:
+            return  # planned: the page count, not empty pages, decides the end
+        cursor.empty_streak = 0 if found_ids else cursor.empty_streak + 1
+        if cursor.empty_streak >= self.max_empty:
+            cursor.done = True
+
+    @property
+    def done(self) -> bool:
+        return all(c.done for c in self.cursors.values())
+
+class ListingCollector:
+    """Frontier, cross-category dedup and checkpointing of a listing crawl; the engines only run the fetches."""
+
+    def __init__(self, categories: Optional[List[str]], start_page: int, max_empty: int,
+                 state: Optional[CrawlState], target_count: int):
+        self.state = state
+        self.target_count = target_count
+        # Resume: keep what earlier runs found and don't refetch their pages
+        self.collected: List[str] = state.product_ids() if state else []
+        self.seen = set(self.collected)
+        fetched = state.fetched_pages() if state else set()
+        self.frontier = CrawlFrontier(categories or CATEGORIES, start_page, max_empty, skip_urls=fetched)
+
+    def full(self) -> bool:
+        return bool(self.target_count) and len(self.collected) >= self.target_count
+
+    def next_page(self) -> Optional[Tuple[str, int]]:
+        return None if self.full() else self.frontier.next_page()
+
+    def result(self, category: str, page_num: int, future: Any) -> None:
+        """Take one finished page fetch (a Future or asyncio.Task) into the frontier and the collected ids."""
+        try:
+            ids, page_count = future.result()
+        except Exception:
+            ids, page_count = [], None
+        self.frontier.report(category, bool(ids), page_count)
+        if not ids:
+            return
+        new_ids = []
+        for pid in ids:
+            if pid not in self.seen and not self.full():
+                self.seen.add(pid)
+                self.collected.append(pid)
+                new_ids.append(pid)
+        if self.state:
+            self.state.record_page(listing_url(category, page_num), category, ids, new_ids)
+
+    def finish(self) -> List[str]:
+        frontier = self.frontier
+        print(f"Listing: {frontier.requested} pages fetched, {frontier.empty} empty; "
+              f"{frontier.planned}/{len(frontier.cursors)} categories planned from result counts")
+        return self.collected[:self.target_count] if self.target_count else self.collected
+
+def thread_session(pool: Optional[SessionPool], limiter: Optional[RateLimiter],
+                   max_workers: int) -> Tuple[Any, Optional[RateLimiter]]:
+    """(session, limiter) for a thread-engine stage; identities in a pool pace themselves, so it gets no limiter."""
+    if pool:
+        return pool, None
+    limiter = limiter or RateLimiter()
+    return make_session(pool_size=max_workers + 4, limiter=limiter), limiter
 
 def collect_prod_ids(
     target_count: int = TARGET_COUNT,
     start_page: int = 1,
     max_workers: int = MAX_WORKERS,
     max_empty: int = MAX_EMPTY_PAGES,
+    limiter: Optional[RateLimiter] = None,
+    state: Optional[CrawlState] = None,
+    categories: Optional[List[str]] = None,
+    cache: Optional[ResponseCache] = None,
+    pool: Optional[SessionPool] = None,
+    items: ListingItems = None,
 ) -> List[str]:
-    session = make_session(pool_size=max_workers + 4)
-    collected, seen = [], set()
-    next_page = start_page
-    empty_streak = 0
+    """Crawl every category's listing pages; return unique prodIds in discovery order (`target_count` 0 = no cap)."""
+    session, limiter = thread_session(pool, limiter, max_workers)
+    crawl = ListingCollector(categories, start_page, max_empty, state, target_count)
 
     with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        # warm up the queue
-        futures = {ex.submit(fetch_page, session, p): p for p in range(next_page, next_page + max_workers)}
-        next_page += max_workers
+        futures: Dict[Any, Tuple[str, int]] = {}
 
-        while futures and len(collected) < target_count and empty_streak < max_empty:
-            for future in as_completed(list(futures.keys())):
-                page_num = futures.pop(future)
-                try:
-                    ids = future.result()
-                except Exception:
-                    ids = []
-
-                if not ids:
-                    empty_streak += 1
-                else:
-                    empty_streak = 0
-                    for pid in ids:
-                        if pid not in seen:
-                            seen.add(pid)
-                            collected.append(pid)
-                            if len(collected) >= target_count:
-                                break
-
-                # keep the pipeline full
-                if len(collected) < target_count and empty_streak < max_empty:
-                    futures[ex.submit(fetch_page, session, next_page)] = next_page
-                    next_page += 1
-
-                if len(collected) >= target_count or empty_streak >= max_empty:
+        # keep the pipeline full, one page per category in turn
+        def fill() -> None:
+            while len(futures) < max_workers:
+                task = crawl.next_page()
+                if task is None:
                     break
+                category, page = task
+                futures[ex.submit(fetch_listing, session, page, limiter, category, cache, items)] = task
+            METRICS.gauge("queue_depth", len(futures), queue="listing_in_flight")
+
+        fill()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                crawl.result(*futures.pop(future), future)
+            fill()
 
-        # Best-effort cancel any not-yet-started tasks (Python 3.9+)
-        ex.shutdown(cancel_futures=True)
+    return crawl.finish()
 
-    return collected[:target_count]
+
+# ========== modelData Extraction (PDP HTML) ==========
+MODEL_DATA_OPEN_RE = re.compile(r"<script\b[^>]*?\sid\s*=\s*[\"']?modelData[\"']?[\s>/]", re.IGNORECASE)
+SCRIPT_CLOSE_RE = re.compile(r"</script\s*>", re.IGNORECASE)
+
+def find_model_data_fast(html: str) -> Optional[str]:
+    """Scan raw HTML for the modelData script and return its JSON text, or None."""
+    m = MODEL_DATA_OPEN_RE.search(html)
+    if not m:
+        return None
+    # The match may stop on the whitespace after the id; skip to the end of the tag
+    start = html.find(">", m.end() - 1)
+    if start == -1:
+        return None
+    close = SCRIPT_CLOSE_RE.search(html, start + 1)
+    if not close:
+        return None
+    text = html[start + 1:close.start()].strip()
+    # Anything that doesn't look like a JSON object is handed to the real parser
+    if not text.startswith("{") or not text.endswith("}"):
+        return None
+    return text
+
+def find_model_data_soup(html: str) -> Optional[str]:
+    """Reference path: full BeautifulSoup parse, then look up the script tag."""
+    soup = BeautifulSoup(html, 'html.parser')
+    model_data_script = soup.find('script', id='modelData')
+    if model_data_script and model_data_script.string:
+        return model_data_script.string.strip()
+    return None
+
+def extract_model_data_json(html: Optional[str]) -> Optional[str]:
+    """Return the modelData JSON text from a PDP, skipping the DOM build when possible."""
+    if not html:
+        return None
+    with METRICS.timer("extract"):
+        text = find_model_data_fast(html)
+        if text is not None:
+            return text
+        # Odd markup (unquoted attrs, nested tags, stray whitespace) -> fall back
+        return find_model_data_soup(html)
 
 
 # ========== Normalization Helpers (PDP modelData) ==========
@@ -149,6 +1047,11 @@ def deep_get(d: Any, path: List[Any], default=None):
             return default
     return cur
 
+def product_of(data: Dict[str, Any]) -> Dict[str, Any]:
+    """pageData.product, resolved once ({} when absent) so helpers don't re-walk from the root."""
+    product = deep_get(data, ["pageData", "product"])
+    return product if isinstance(product, dict) else {}
+
 def to_abs_url(url: Optional[str]) -> Optional[str]:
     if not url:
         return url
@@ -160,18 +1063,20 @@ def to_abs_url(url: Optional[str]) -> Optional[str]:
         return f"{BASE_URL}/{url.lstrip('/')}"
     return url
 
-def extract_name(data: Dict[str, Any]) -> Optional[str]:
+def extract_name(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> Optional[str]:
     full_title = deep_get(data, ["title"])
     if isinstance(full_title, str) and " | " in full_title:
         return full_title.split(" | ", 1)[0].strip()
-    brand = deep_get(data, ["pageData", "product", "brand", "name"]) or "REI Co-op"
-    prod_title = deep_get(data, ["pageData", "product", "title"])
+    product = product_of(data) if product is None else product
+    brand = deep_get(product, ["brand", "name"]) or "REI Co-op"
+    prod_title = product.get("title")
     if prod_title:
         return f"{brand} {prod_title}".strip()
     return None
 
-def extract_product_id(data: Dict[str, Any]) -> Optional[str]:
-    return deep_get(data, ["pageData", "product", "styleId"])
+def extract_product_id(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    product = product_of(data) if product is None else product
+    return product.get("styleId")
 
 def extract_description(data: Dict[str, Any]) -> Optional[str]:
     desc = data.get("description")
@@ -182,17 +1087,19 @@ def extract_description(data: Dict[str, Any]) -> Optional[str]:
         return meta_desc.strip()
     return None
 
-def extract_canonical_url(data: Dict[str, Any]) -> Optional[str]:
+def extract_canonical_url(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> Optional[str]:
     og_url = deep_get(data, ["openGraphProperties", "og:url"])
     if isinstance(og_url, str):
         return to_abs_url(og_url)
-    can = deep_get(data, ["pageData", "product", "canonicalUrl"])
+    product = product_of(data) if product is None else product
+    can = product.get("canonicalUrl")
     if isinstance(can, str):
         return to_abs_url(can)
     return None
 
-def extract_breadcrumbs(data: Dict[str, Any]):
-    crumbs = deep_get(data, ["pageData", "product", "breadcrumbs"], default=[]) or []
+def extract_breadcrumbs(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
+    product = product_of(data) if product is None else product
+    crumbs = product.get("breadcrumbs") or []
     out = []
     for c in crumbs:
         item = c.get("item") if isinstance(c, dict) else None
@@ -207,13 +1114,13 @@ def extract_breadcrumbs(data: Dict[str, Any]):
 def extract_categories(data: Dict[str, Any]) -> List[str]:
     return [b["name"] for b in extract_breadcrumbs(data)]
 
-def extract_taxonomy(data: Dict[str, Any]):
-    taxCat = deep_get(data, ["pageData", "product", "taxCat"])
-    taxCatRoot = deep_get(data, ["pageData", "product", "taxCatRoot"])
-    return taxCat, taxCatRoot
+def extract_taxonomy(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
+    product = product_of(data) if product is None else product
+    return product.get("taxCat"), product.get("taxCatRoot")
 
-def extract_brand(data: Dict[str, Any]):
-    b = deep_get(data, ["pageData", "product", "brand"]) or {}
+def extract_brand(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
+    product = product_of(data) if product is None else product
+    b = product.get("brand") or {}
     if not isinstance(b, dict):
         return None
     out = dict(b)  # shallow copy
@@ -223,8 +1130,9 @@ def extract_brand(data: Dict[str, Any]):
             out[key] = to_abs_url(out[key])
     return out
 
-def extract_colors(data: Dict[str, Any]) -> List[str]:
-    colors = deep_get(data, ["pageData", "product", "colors"], default=[]) or []
+def extract_colors(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> List[str]:
+    product = product_of(data) if product is None else product
+    colors = product.get("colors") or []
     labels = []
     for c in colors:
         label = c.get("displayLabel") or c.get("name")
@@ -236,55 +1144,68 @@ def extract_colors(data: Dict[str, Any]) -> List[str]:
             seen.add(v); uniq.append(v)
     return uniq
 
-def extract_sizes(data: Dict[str, Any]) -> List[str]:
-    sizes = deep_get(data, ["pageData", "product", "sizesV2"]) or deep_get(data, ["pageData", "product", "sizes"]) or []
+def extract_sizes(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> List[str]:
+    product = product_of(data) if product is None else product
+    sizes = product.get("sizesV2") or product.get("sizes") or []
     return [str(s) for s in sizes] if isinstance(sizes, list) else []
 
-def extract_price_info(data: Dict[str, Any]) -> Tuple[Optional[float], Optional[Tuple[float, float]], bool, List[int]]:
-    skus = deep_get(data, ["pageData", "product", "skus"], default=[]) or []
+def summarize_skus(skus: List[Any]) -> Tuple[Optional[float], Optional[Tuple[float, float]], bool, List[int], Optional[str]]:
+    """One pass over the SKUs: (regular price, sale range, on sale, savings %s, availability)."""
     regulars, sale_vals, savings_pct = [], [], set()
     is_on_sale = False
+    unavailable = sellable = 0
     for sku in skus:
-        cmp_val = deep_get(sku, ["price", "compareAt", "value"])
-        price_val = deep_get(sku, ["price", "price", "value"])
-        offer_type = deep_get(sku, ["price", "price", "offerType"])
-        sale_flag = deep_get(sku, ["price", "price", "sale"]) or (offer_type in {"sale", "clearance"})
+        price = sku.get("price")
+        cmp_val = price_val = offer_type = sale = sp = None
+        if isinstance(price, dict):
+            compare_at = price.get("compareAt")
+            if isinstance(compare_at, dict):
+                cmp_val = compare_at.get("value")
+            current = price.get("price")
+            if isinstance(current, dict):
+                price_val, offer_type, sale = current.get("value"), current.get("offerType"), current.get("sale")
+            sp = price.get("savingsPercentage")
+        sale_flag = sale or (offer_type in {"sale", "clearance"})
         if isinstance(cmp_val, (int, float)): regulars.append(float(cmp_val))
         if sale_flag and isinstance(price_val, (int, float)):
             sale_vals.append(float(price_val)); is_on_sale = True
-        sp = deep_get(sku, ["price", "savingsPercentage"])
         if isinstance(sp, (int, float)):
             try: savings_pct.add(int(round(float(sp))))
             except Exception: pass
+        if sku.get("unavailable") or (sku.get("status") == "UNAVAILABLE"): unavailable += 1
+        if sku.get("sellable"): sellable += 1
+
     regular_price = max(regulars) if regulars else (max(sale_vals) if sale_vals else None)
     sale_range = (min(sale_vals), max(sale_vals)) if sale_vals else None
-    return regular_price, sale_range, is_on_sale, sorted(savings_pct)
+    return regular_price, sale_range, is_on_sale, sorted(savings_pct), availability_label(len(skus), unavailable, sellable)
 
-def summarize_availability(data: Dict[str, Any]) -> Optional[str]:
-    skus = deep_get(data, ["pageData", "product", "skus"], default=[]) or []
-    if not skus: return None
-    total = len(skus)
-    unavailable = sum(1 for s in skus if s.get("unavailable") or (s.get("status") == "UNAVAILABLE"))
-    sellable = sum(1 for s in skus if s.get("sellable"))
+def availability_label(total: int, unavailable: int, sellable: int) -> Optional[str]:
+    if not total: return None
     if sellable == 0: return "Unavailable — All SKUs are currently unavailable."
     ratio = unavailable / total if total else 0
     if ratio >= 0.5: return "Limited — Many SKUs are unavailable; some colors/sizes may be on clearance or backorder."
     if 0 < ratio < 0.5: return "Partially available — Some sizes or colors are out of stock."
     return "In stock — Most options available."
 
-def extract_features(data: Dict[str, Any]) -> List[str]:
-    for c in (deep_get(data, ["pageData", "product", "features"]),
-              deep_get(data, ["pageData", "product", "bullets"]),
-              deep_get(data, ["pageData", "product", "highlights"])):
+def extract_price_info(data: Dict[str, Any]) -> Tuple[Optional[float], Optional[Tuple[float, float]], bool, List[int]]:
+    return summarize_skus(product_of(data).get("skus") or [])[:4]
+
+def summarize_availability(data: Dict[str, Any]) -> Optional[str]:
+    return summarize_skus(product_of(data).get("skus") or [])[4]
+
+def extract_features(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> List[str]:
+    product = product_of(data) if product is None else product
+    for c in (product.get("features"), product.get("bullets"), product.get("highlights")):
         if isinstance(c, list) and c:
             return [str(x).strip() for x in c if str(x).strip()]
-    long_desc = deep_get(data, ["pageData", "product", "longDescription"])
+    long_desc = product.get("longDescription")
     if isinstance(long_desc, str) and long_desc.strip():
         return [p.strip("•- \n\r\t") for p in long_desc.split("\n") if p.strip()][:15]
     return []
 
-def extract_specs(data: Dict[str, Any]) -> Dict[str, str]:
-    specs = deep_get(data, ["pageData", "product", "specs"])
+def extract_specs(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    product = product_of(data) if product is None else product
+    specs = product.get("specs")
     if isinstance(specs, dict):
         return {str(k).strip(): str(v).strip() for k, v in specs.items()}
     if isinstance(specs, list):
@@ -293,7 +1214,7 @@ def extract_specs(data: Dict[str, Any]) -> Dict[str, str]:
             k, v = row.get("name"), row.get("value")
             if k and v: out[str(k).strip()] = str(v).strip()
         if out: return out
-    attrs = deep_get(data, ["pageData", "product", "attributes"])
+    attrs = product.get("attributes")
     if isinstance(attrs, list):
         out = {}
         for a in attrs:
@@ -303,7 +1224,47 @@ def extract_specs(data: Dict[str, Any]) -> Dict[str, str]:
         if out: return out
     return {}
 
-def extract_ratings(data: Dict[str, Any]):
+def follow_path(o: Any, path: Tuple[Any, ...]) -> Any:
+    """deep_get that also steps through list indices; None when the path breaks."""
+    for key in path:
+        if isinstance(key, int):
+            if not isinstance(o, list) or not -len(o) <= key < len(o): return None
+            o = o[key]
+        elif isinstance(o, dict) and key in o:
+            o = o[key]
+        else:
+            return None
+    return o
+
+class RatingsLocator:
+    """Where the review summary was found, per page-template signature, so extract_ratings walks the tree only once."""
+
+    def __init__(self):
+        self.paths: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+
+    @staticmethod
+    def signature(data: Dict[str, Any]) -> Tuple[Any, ...]:
+        page = data.get("pageData")
+        return tuple(sorted(data)), tuple(sorted(page)) if isinstance(page, dict) else ()
+
+    def lookup(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self.paths.get(self.signature(data))
+        if path is None:
+            return None
+        rs = follow_path(data, path)
+        if not (isinstance(rs, dict) and rs):
+            return None
+        METRICS.inc("ratings_walks_avoided_total")
+        return rs
+
+    def learn(self, data: Dict[str, Any], path: Optional[Tuple[Any, ...]]) -> None:
+        METRICS.inc("ratings_walks_total")
+        if path is not None:
+            self.paths[self.signature(data)] = path
+
+RATINGS_LOCATOR = RatingsLocator()
+
+def extract_ratings(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
     def coerce_summary(rs: Dict[str, Any]):
         avg = rs.get("averageRating"); cnt = rs.get("count", rs.get("reviewCount"))
         hist = rs.get("ratingHistogram"); top = rs.get("topRated")
@@ -318,224 +1279,2145 @@ def extract_ratings(data: Dict[str, Any]):
         if not isinstance(top, bool): top = None
         return avg, cnt, hist, top
 
-    for path in (["pageData","product","reviews","reviewSummary"],
-                 ["pageData","product","reviewSummary"],
-                 ["reviews","reviewSummary"],
-                 ["reviewSummary"]):
-        rs = deep_get(data, path)
+    product = product_of(data) if product is None else product
+    for root, path in ((product, ["reviews","reviewSummary"]),
+                       (product, ["reviewSummary"]),
+                       (data, ["reviews","reviewSummary"]),
+                       (data, ["reviewSummary"])):
+        rs = deep_get(root, path)
         if isinstance(rs, dict): return coerce_summary(rs)
 
-    candidates: List[Dict[str, Any]] = []
-    def walk(o: Any):
+    # Unknown template: try the path learned from earlier pages before walking the tree
+    rs = RATINGS_LOCATOR.lookup(data)
+    if rs is not None: return coerce_summary(rs)
+
+    candidates: List[Tuple[Tuple[Any, ...], Dict[str, Any]]] = []
+    def walk(o: Any, path: Tuple[Any, ...]):
         if isinstance(o, dict):
             inner = o.get("reviewSummary")
-            if isinstance(inner, dict): candidates.append(inner)
-            if ("averageRating" in o) and ("count" in o or "reviewCount" in o): candidates.append(o)
-            for v in o.values(): walk(v)
+            if isinstance(inner, dict): candidates.append((path + ("reviewSummary",), inner))
+            if ("averageRating" in o) and ("count" in o or "reviewCount" in o): candidates.append((path, o))
+            for k, v in o.items(): walk(v, path + (k,))
         elif isinstance(o, list):
-            for v in o: walk(v)
-    walk(data)
+            for i, v in enumerate(o): walk(v, path + (i,))
+    walk(data, ())
 
-    best, best_cnt = None, -1
-    for rs in candidates:
+    best, best_path, best_cnt = None, None, -1
+    for path, rs in candidates:
         try_cnt = rs.get("count", rs.get("reviewCount"))
         try:
             try_cnt = int(try_cnt) if try_cnt is not None else -1
         except Exception:
             try_cnt = -1
-        if try_cnt > best_cnt: best_cnt, best = try_cnt, rs
+        if try_cnt > best_cnt: best_cnt, best, best_path = try_cnt, rs, path
+    RATINGS_LOCATOR.learn(data, best_path if best else None)
     if best: return coerce_summary(best)
 
-    avg = deep_get(data, ["pageData","product","reviews","averageRating"]) or deep_get(data, ["pageData","product","averageRating"])
-    cnt = deep_get(data, ["pageData","product","reviews","reviewCount"]) or deep_get(data, ["pageData","product","reviewCount"])
+    avg = deep_get(product, ["reviews","averageRating"]) or product.get("averageRating")
+    cnt = deep_get(product, ["reviews","reviewCount"]) or product.get("reviewCount")
     try: avg = float(avg) if avg is not None else None
     except Exception: avg = None
     try: cnt = int(cnt) if cnt is not None else None
     except Exception: cnt = None
     return avg, cnt, None, None
 
-def extract_featured_image(data: Dict[str, Any]) -> Optional[str]:
-    featured = deep_get(data, ["pageData","product","displayOptions","featuredImage","heroImageUrl"])
+def extract_featured_image(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    product = product_of(data) if product is None else product
+    featured = deep_get(product, ["displayOptions","featuredImage","heroImageUrl"])
     return to_abs_url(featured)
 
-def extract_images_full(data: Dict[str, Any]):
-    images = deep_get(data, ["pageData","product","images"])
+def extract_images_full(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
+    product = product_of(data) if product is None else product
+    images = product.get("images")
     return images if isinstance(images, list) else None
 
-def extract_videos(data: Dict[str, Any]):
-    vids = deep_get(data, ["pageData","product","videos"])
+def extract_videos(data: Dict[str, Any], product: Optional[Dict[str, Any]] = None):
+    product = product_of(data) if product is None else product
+    vids = product.get("videos")
     return vids if isinstance(vids, list) else None
 
-def build_output(data: Dict[str, Any]) -> Dict[str, Any]:
-    product_name = extract_name(data)
-    product_id = extract_product_id(data)
-    description = extract_description(data)
-    canonical_url = extract_canonical_url(data)
-    breadcrumbs = extract_breadcrumbs(data)
-    categories = [b["name"] for b in breadcrumbs]
-    taxCat, taxCatRoot = extract_taxonomy(data)
-    brand = extract_brand(data)
-    colors = extract_colors(data)
-    sizes = extract_sizes(data)
-    regular_price, sale_range, is_on_sale, savings_pct = extract_price_info(data)
-    availability = summarize_availability(data)
-    features = extract_features(data)
-    specs = extract_specs(data)
-    avg_rating, review_count, rating_histogram, top_rated = extract_ratings(data)
-    featured_img = extract_featured_image(data)
-    images_full = extract_images_full(data)
-    videos = extract_videos(data)
-
-    # Flags straight from product
-    sapGender = deep_get(data, ["pageData","product","sapGender"])
-    eligibleForShipping = deep_get(data, ["pageData","product","eligibleForShipping"])
-    allSkusAreBopusOnly = deep_get(data, ["pageData","product","allSkusAreBopusOnly"])
-    anyOversizeCharges = deep_get(data, ["pageData","product","anyOversizeCharges"])
-    anySkuShippingRestrictions = deep_get(data, ["pageData","product","anySkuShippingRestrictions"])
-    anySkusAreMembersOnly = deep_get(data, ["pageData","product","anySkusAreMembersOnly"])
-    allDisplayableSkusArePreorder = deep_get(data, ["pageData","product","allDisplayableSkusArePreorder"])
-    allDisplayableSkusAreBackorder = deep_get(data, ["pageData","product","allDisplayableSkusAreBackorder"])
-
-    skus_raw = deep_get(data, ["pageData", "product", "skus"])
-
-    out_core = {
-        "productId": str(product_id) if product_id is not None else None,
-        "productName": product_name,
-        "brand": brand,
-        "description": description,
-
-        "media": {
-            "featuredImage": featured_img,
-            "allImages": images_full,
-            "videos": videos,
-        },
-
-       "price": {
-            "regularPrice": regular_price,
-            "salePriceRange": list(sale_range) if sale_range else None,
-            "isOnSale": bool(is_on_sale),
-            "savingsPercentage": savings_pct or None,
-        },
-
-        "colors": colors,
-        "sizes": sizes,
-
-        "availability": availability,
-        "features": features,
-        "specs": specs,
-
-        "ratings": {
-            "averageRating": avg_rating,
-            "reviewCount": review_count,
-            "ratingHistogram": rating_histogram,
-            "topRated": top_rated,
-        },
-
-        "metadata": {
-            "canonicalUrl": canonical_url,
-            "breadcrumbs": breadcrumbs,
-            "categories": categories,
-            "taxCat": taxCat,
-            "taxCatRoot": taxCatRoot,
-        },
+# Flags copied straight from pageData.product into "shippingAndEligibility"
+SHIPPING_FLAGS = (
+    "sapGender", "eligibleForShipping", "allSkusAreBopusOnly", "anyOversizeCharges",
+    "anySkuShippingRestrictions", "anySkusAreMembersOnly", "allDisplayableSkusArePreorder",
+    "allDisplayableSkusAreBackorder",
+)
+
+# ========== Product Records ==========
+EMPTY_VALUES = (None, [], {}, "")
+
+def prune(obj: Any) -> Any:
+    """Drop None/empty values from raw nested dicts and lists."""
+    if isinstance(obj, dict):
+        cleaned = {}
+        for k, v in obj.items():
+            pv = prune(v)
+            if pv not in EMPTY_VALUES:
+                cleaned[k] = pv
+        return cleaned
+    if isinstance(obj, list):
+        cleaned_list = []
+        for v in obj:
+            pv = prune(v)
+            if pv not in EMPTY_VALUES:
+                cleaned_list.append(pv)
+        return cleaned_list
+    return obj
+
+class Record:
+    """Fixed-field output section; empty fields are left out when it is encoded, not pruned up front."""
+    __slots__ = ()
+
+    def __init__(self, **fields: Any):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                value = value.as_dict()
+            if value not in EMPTY_VALUES:
+                out[name] = value
+        return out
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+class Media(Record):
+    __slots__ = ("featuredImage", "allImages", "videos")
+
+class PriceInfo(Record):
+    __slots__ = ("regularPrice", "salePriceRange", "isOnSale", "savingsPercentage")
+
+class Ratings(Record):
+    __slots__ = ("averageRating", "reviewCount", "ratingHistogram", "topRated")
+
+class Metadata(Record):
+    __slots__ = ("canonicalUrl", "breadcrumbs", "categories", "taxCat", "taxCatRoot")
+
+class Shipping(Record):
+    __slots__ = SHIPPING_FLAGS
+
+class ProductRecord(Record):
+    """One normalized product; `prodId` and `listingCategories` are set when it is streamed."""
+    __slots__ = ("prodId", "listingCategories", "productId", "productName", "brand", "description", "media", "price", "colors", "sizes",
+                 "availability", "features", "specs", "ratings", "metadata", "shippingAndEligibility", "skus")
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = super().as_dict()
+        if self.skus is not None:
+            out["skus"] = self.skus  # raw and unpruned, always last
+        return out
+
+    def to_json(self) -> str:
+        return dumps_json(self.as_dict())
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProductRecord":
+        """Rebuild a record from its `as_dict` form, e.g. a line of an earlier output stream."""
+        fields = dict(data)
+        for name, section in PRODUCT_SECTIONS.items():
+            fields[name] = section(**(data.get(name) or {}))
+        return cls(**fields)
+
+PRODUCT_SECTIONS = {"media": Media, "price": PriceInfo, "ratings": Ratings, "metadata": Metadata,
+                    "shippingAndEligibility": Shipping}
+
+def build_output(data: Dict[str, Any]) -> ProductRecord:
+    # Resolve pageData.product once; every helper reads from it directly
+    product = product_of(data)
+    product_id = extract_product_id(data, product)
+    breadcrumbs = extract_breadcrumbs(data, product)
+    taxCat, taxCatRoot = extract_taxonomy(data, product)
+    # Price and availability come out of a single pass over the SKUs
+    skus_raw = product.get("skus")
+    regular_price, sale_range, is_on_sale, savings_pct, availability = summarize_skus(skus_raw or [])
+    avg_rating, review_count, rating_histogram, top_rated = extract_ratings(data, product)
+
+    # Raw sub-trees are pruned here; empty scalar fields are skipped at encode time
+    return ProductRecord(
+        productId=str(product_id) if product_id is not None else None,
+        productName=extract_name(data, product),
+        brand=prune(extract_brand(data, product)),
+        description=extract_description(data),
+        media=Media(
+            featuredImage=extract_featured_image(data, product),
+            allImages=prune(extract_images_full(data, product)),
+            videos=prune(extract_videos(data, product)),
+        ),
+        price=PriceInfo(
+            regularPrice=regular_price,
+            salePriceRange=list(sale_range) if sale_range else None,
+            isOnSale=bool(is_on_sale),
+            savingsPercentage=savings_pct or None,
+        ),
+        colors=prune(extract_colors(data, product)),
+        sizes=prune(extract_sizes(data, product)),
+        availability=availability,
+        features=prune(extract_features(data, product)),
+        specs=prune(extract_specs(data, product)),
+        ratings=Ratings(
+            averageRating=avg_rating,
+            reviewCount=review_count,
+            ratingHistogram=rating_histogram,
+            topRated=top_rated,
+        ),
+        metadata=Metadata(
+            canonicalUrl=extract_canonical_url(data, product),
+            breadcrumbs=prune(breadcrumbs),
+            categories=[b["name"] for b in breadcrumbs],
+            taxCat=taxCat,
+            taxCatRoot=taxCatRoot,
+        ),
+        shippingAndEligibility=Shipping(**{flag: prune(product.get(flag)) for flag in SHIPPING_FLAGS}),
+        skus=skus_raw,
+    )
 
-        "shippingAndEligibility": {
-            "sapGender": sapGender,
-            "eligibleForShipping": eligibleForShipping,
-            "allSkusAreBopusOnly": allSkusAreBopusOnly,
-            "anyOversizeCharges": anyOversizeCharges,
-            "anySkuShippingRestrictions": anySkuShippingRestrictions,
-            "anySkusAreMembersOnly": anySkusAreMembersOnly,
-            "allDisplayableSkusArePreorder": allDisplayableSkusArePreorder,
-            "allDisplayableSkusAreBackorder": allDisplayableSkusAreBackorder,
-        }
+# ========== Output (streaming JSONL) ==========
+ProductSink = Callable[[str, ProductRecord], None]
+
+def stream_path(path: str, compression: str = "none") -> str:
+    suffix = COMPRESSION_SUFFIXES[compression]
+    return path if path.endswith(suffix) else path + suffix
+
+def compression_for(path: str) -> str:
+    for name, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and path.endswith(suffix):
+            return name
+    return "none"
+
+def open_stream(path: str, mode: str = "r") -> IO[str]:
+    """Open a (possibly compressed) text stream; `mode` is "r", "w" or "a"."""
+    compression = compression_for(path)
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            binary = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            # Appending starts a new frame; readers decode across frames
+            binary = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(binary, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+class JsonlWriter:
+    """Thread-safe JSONL writer; keys reach `on_flush` only once their lines are flushed."""
+
+    def __init__(self, path: str, mode: str = "w", flush_every: int = STREAM_FLUSH_EVERY,
+                 on_flush: Optional[Callable[[List[str]], None]] = None):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.on_flush = on_flush
+        self.count = 0
+        self._fh = open_stream(path, mode)
+        self._lock = threading.Lock()
+        self._unflushed: List[str] = []
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, record: Any, key: Optional[str] = None) -> None:
+        line = (record.to_json() if isinstance(record, ProductRecord) else dumps_json(record)) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self.count += 1
+            if key is not None:
+                self._unflushed.append(key)
+            if self.count % self.flush_every == 0:
+                self._flush()
+
+    def _flush(self) -> None:
+        self._fh.flush()
+        if self._unflushed and self.on_flush is not None:
+            self.on_flush(self._unflushed)
+        self._unflushed = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._flush()
+                self._fh.close()
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSONL stream, skipping lines that do not decode and stopping at a truncated compressed tail."""
+    with open_stream(path, "r") as fh:
+        try:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    yield loads_json(line)
+                except json.JSONDecodeError:
+                    continue
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+def trim_stream(path: str, keep: Optional[int] = None) -> int:
+    """Cut a stream back to its first `keep` lines (or last complete line) before appending; return the lines kept."""
+    if not os.path.exists(path):
+        return 0
+    kept = 0
+    compression = compression_for(path)
+    if compression == "none":
+        end = 0
+        with open(path, "rb") as fh:
+            for raw in fh:
+                if not raw.endswith(b"\n") or kept == keep:
+                    break
+                end += len(raw)
+                kept += 1
+            torn = fh.seek(0, os.SEEK_END) != end
+        if torn:
+            with open(path, "r+b") as fh:
+                fh.truncate(end)
+        return kept
+    suffix = COMPRESSION_SUFFIXES[compression]
+    tmp = path[:-len(suffix)] + ".trim" + suffix
+    with open_stream(path, "r") as src, open_stream(tmp, "w") as dst:
+        try:
+            for line in src:
+                if not line.endswith("\n") or kept == keep:
+                    break
+                dst.write(line)
+                kept += 1
+        except (EOFError, gzip.BadGzipFile):
+            pass
+    os.replace(tmp, path)
+    return kept
+
+def rebuild_json_array(src: str, dest: str = OUTPUT_PRODUCT_DATA) -> int:
+    """Write the JSONL stream out as the classic `json.dump(..., indent=4)` array, one record at a time."""
+    count = 0
+    with open(dest, "w", encoding="utf-8") as out:
+        for record in iter_jsonl(src):
+            body = json.dumps(record, indent=4).replace("\n", "\n    ")
+            out.write(("[\n    " if count == 0 else ",\n    ") + body)
+            count += 1
+        out.write("\n]" if count else "[]")
+    return count
+
+
+# ========== Columnar Export (Parquet) ==========
+def as_float(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+def as_bool(value: Any) -> Optional[bool]:
+    return value if isinstance(value, bool) else None
+
+def as_str(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+def label_of(value: Any, *keys: str) -> Optional[str]:
+    """A SKU's color/size: either a plain string or a dict carrying one of `keys`."""
+    if isinstance(value, dict):
+        for key in keys:
+            if isinstance(value.get(key), str):
+                return value[key]
+        return None
+    return as_str(value)
+
+def product_row(record: ProductRecord) -> Dict[str, Any]:
+    """One products-table row; list/map columns stay typed instead of nested JSON."""
+    price, ratings, meta, ship = record.price, record.ratings, record.metadata, record.shippingAndEligibility
+    sale = price.salePriceRange or [None, None]
+    return {
+        "prodId": record.prodId,
+        "listingCategories": record.listingCategories,
+        "productId": record.productId,
+        "productName": record.productName,
+        "brand": as_str((record.brand or {}).get("name")),
+        "description": record.description,
+        "featuredImage": record.media.featuredImage,
+        "regularPrice": price.regularPrice,
+        "saleMin": sale[0],
+        "saleMax": sale[1],
+        "isOnSale": price.isOnSale,
+        "savingsPercentage": price.savingsPercentage,
+        "colors": record.colors,
+        "sizes": record.sizes,
+        "availability": record.availability,
+        "features": record.features,
+        "specs": list((record.specs or {}).items()),
+        "averageRating": ratings.averageRating,
+        "reviewCount": ratings.reviewCount,
+        "topRated": ratings.topRated,
+        "canonicalUrl": meta.canonicalUrl,
+        "categories": meta.categories,
+        "taxCat": as_str(meta.taxCat),
+        "taxCatRoot": as_str(meta.taxCatRoot),
+        "sapGender": as_str(ship.sapGender),
+        **{flag: as_bool(getattr(ship, flag)) for flag in SHIPPING_FLAGS[1:]},
+        "skuCount": len(record.skus) if isinstance(record.skus, list) else 0,
     }
 
-    def prune(obj: Any) -> Any:
-        if isinstance(obj, dict):
-            cleaned = {}
-            for k, v in obj.items():
-                pv = prune(v)
-                if pv not in (None, [], {}, ""):
-                    cleaned[k] = pv
-            return cleaned
-        if isinstance(obj, list):
-            cleaned_list = []
-            for v in obj:
-                pv = prune(v)
-                if pv not in (None, [], {}, ""):
-                    cleaned_list.append(pv)
-            return cleaned_list
-        return obj
-
-    pruned = prune(out_core)
-    if skus_raw is not None:
-        pruned["skus"] = skus_raw  # append raw, unpruned, at the end
-    return pruned
-
-# ========== Main Orchestration ==========
-def main() -> None:
-    prod_ids = collect_prod_ids()
-    print(f"✅ Collected {len(prod_ids)} prodIds")
-    # Save the list
-    with open(PRODUCT_IPS, "w", encoding="utf-8") as f:
-        json.dump(prod_ids, f, indent=2)
-    print("💾 Saved to prod_ids.json and prod_ids.txt")
+def sku_rows(record: ProductRecord) -> List[Dict[str, Any]]:
+    """Flatten a product's raw SKUs: one row each, with the price fields summarize_skus reads."""
+    rows = []
+    for sku in record.skus if isinstance(record.skus, list) else ():
+        if not isinstance(sku, dict):
+            continue
+        price = sku.get("price") if isinstance(sku.get("price"), dict) else {}
+        current = price.get("price") if isinstance(price.get("price"), dict) else {}
+        compare_at = price.get("compareAt") if isinstance(price.get("compareAt"), dict) else {}
+        offer_type = as_str(current.get("offerType"))
+        unavailable = bool(sku.get("unavailable") or sku.get("status") == "UNAVAILABLE")
+        rows.append({
+            "prodId": record.prodId,
+            "productId": record.productId,
+            "skuId": None if sku.get("skuId") is None else str(sku["skuId"]),
+            "color": label_of(sku.get("color"), "displayLabel", "name"),
+            "colorCode": label_of(sku.get("color"), "code"),
+            "size": label_of(sku.get("size"), "name", "displayLabel"),
+            "sizeCode": label_of(sku.get("size"), "code"),
+            "price": as_float(current.get("value")),
+            "compareAt": as_float(compare_at.get("value")),
+            "sale": bool(current.get("sale") or offer_type in {"sale", "clearance"}),
+            "offerType": offer_type,
+            "savingsPercentage": as_float(price.get("savingsPercentage")),
+            "sellable": bool(sku.get("sellable")),
+            "unavailable": unavailable,
+            "status": as_str(sku.get("status")),
+        })
+    return rows
+
+def parquet_schemas() -> Dict[str, Any]:
+    strings = pa.list_(pa.string())
+    products = pa.schema(
+        [("prodId", pa.string()), ("listingCategories", strings), ("productId", pa.string()),
+         ("productName", pa.string()), ("brand", pa.string()), ("description", pa.string()),
+         ("featuredImage", pa.string()),
+         ("regularPrice", pa.float64()), ("saleMin", pa.float64()), ("saleMax", pa.float64()),
+         ("isOnSale", pa.bool_()), ("savingsPercentage", pa.list_(pa.int64())),
+         ("colors", strings), ("sizes", strings), ("availability", pa.string()), ("features", strings),
+         ("specs", pa.map_(pa.string(), pa.string())),
+         ("averageRating", pa.float64()), ("reviewCount", pa.int64()), ("topRated", pa.bool_()),
+         ("canonicalUrl", pa.string()), ("categories", strings), ("taxCat", pa.string()), ("taxCatRoot", pa.string()),
+         ("sapGender", pa.string())]
+        + [(flag, pa.bool_()) for flag in SHIPPING_FLAGS[1:]]
+        + [("skuCount", pa.int32())])
+    skus = pa.schema(
+        [("prodId", pa.string()), ("productId", pa.string()), ("skuId", pa.string()), ("color", pa.string()),
+         ("colorCode", pa.string()), ("size", pa.string()), ("sizeCode", pa.string()), ("price", pa.float64()),
+         ("compareAt", pa.float64()),
+         ("sale", pa.bool_()), ("offerType", pa.string()), ("savingsPercentage", pa.float64()),
+         ("sellable", pa.bool_()), ("unavailable", pa.bool_()), ("status", pa.string())])
+    return {"products": products, "skus": skus}
+
+class ParquetSink:
+    """Products and flattened SKUs as Parquet datasets under `<directory>/`, one complete part file per batch."""
+
+    def __init__(self, directory: str, mode: str = "w", batch_size: int = PARQUET_BATCH,
+                 on_flush: Optional[Callable[[List[str]], None]] = None, keep: Optional[int] = None):
+        if pa is None:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package")
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.on_flush = on_flush
+        self.count = 0
+        self.sku_count = 0
+        self.parts = 0
+        self._schemas = parquet_schemas()
+        for table in self._schemas:
+            folder = os.path.join(directory, table)
+            os.makedirs(folder, exist_ok=True)
+            for name in os.listdir(folder):
+                if not (name.startswith("part-") and name[5:10].isdigit()):
+                    continue
+                index = int(name[5:10])
+                # A .tmp part was cut off before its footer; parts past `keep` hold rows the checkpoint lacks
+                if mode == "w" or not name.endswith(".parquet") or (keep is not None and index >= keep):
+                    os.remove(os.path.join(folder, name))
+                else:
+                    self.parts = max(self.parts, index + 1)
+        self._rows: Dict[str, List[Dict[str, Any]]] = {table: [] for table in self._schemas}
+        self._unflushed: List[str] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ParquetSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, record: ProductRecord, key: Optional[str] = None) -> None:
+        product, skus = product_row(record), sku_rows(record)
+        with self._lock:
+            self._rows["products"].append(product)
+            self._rows["skus"].extend(skus)
+            self.count += 1
+            self.sku_count += len(skus)
+            if key is not None:
+                self._unflushed.append(key)
+            if len(self._rows["products"]) >= self.batch_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows["products"]:
+            return
+        for table, rows in self._rows.items():
+            if not rows:
+                continue
+            path = os.path.join(self.directory, table, f"part-{self.parts:05d}.parquet")
+            pq.write_table(pa.Table.from_pylist(rows, schema=self._schemas[table]), path + ".tmp",
+                           row_group_size=len(rows), compression="zstd")
+            os.replace(path + ".tmp", path)
+            self._rows[table] = []
+        self.parts += 1
+        if self._unflushed and self.on_flush is not None:
+            self.on_flush(self._unflushed)
+        self._unflushed = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        self.flush()
+
+
+# ========== Crawl State (checkpoint/resume) ==========
+class CrawlState:
+    """SQLite (WAL) checkpoint: listing pages fetched, prodIds discovered and per-PDP status and attempts."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS listing_pages (
+            url TEXT PRIMARY KEY, item_count INTEGER NOT NULL, fetched_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS products (
+            prod_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            discovered_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS products_status ON products (status);
+        CREATE TABLE IF NOT EXISTS product_categories (
+            prod_id TEXT NOT NULL, category TEXT NOT NULL, PRIMARY KEY (prod_id, category)
+        );
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            prod_id TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS listing_snapshots (
+            prod_id TEXT PRIMARY KEY,
+            fields_hash TEXT NOT NULL,
+            fields TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def reset(self) -> None:
+        """Start a new crawl. Fingerprints and listing snapshots survive, so the next run can diff against them."""
+        with self._lock, self._conn:
+            for table in ("meta", "listing_pages", "products", "product_categories"):
+                self._conn.execute(f"DELETE FROM {table}")
+
+    # --- meta ---
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- listing stage ---
+    def fetched_pages(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT url FROM listing_pages")}
+
+    def record_page(self, url: str, category: str, page_ids: List[str], new_ids: List[str]) -> None:
+        """Mark one listing page fetched, queue its new prodIds and note their category, atomically."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listing_pages (url, item_count, fetched_at) VALUES (?, ?, ?)",
+                (url, len(page_ids), now),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO products (prod_id, discovered_at, updated_at) VALUES (?, ?, ?)",
+                [(pid, now, now) for pid in new_ids],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO product_categories (prod_id, category) VALUES (?, ?)",
+                [(pid, category) for pid in page_ids],
+            )
+
+    def categories_of(self) -> Dict[str, List[str]]:
+        """prodId -> every category it was listed in."""
+        out: Dict[str, List[str]] = {}
+        with self._lock:
+            for pid, category in self._conn.execute("SELECT prod_id, category FROM product_categories ORDER BY rowid"):
+                out.setdefault(pid, []).append(category)
+        return out
+
+    def add_products(self, prod_ids: List[str]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO products (prod_id, discovered_at, updated_at) VALUES (?, ?, ?)",
+                [(pid, now, now) for pid in prod_ids],
+            )
+
+    def product_ids(self) -> List[str]:
+        """Every discovered prodId, in discovery order."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT prod_id FROM products ORDER BY rowid")]
+
+    # --- PDP stage ---
+    def pending(self, max_attempts: int = PDP_MAX_ATTEMPTS) -> List[str]:
+        """prodIds still to scrape: pending, or failed with attempts left."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prod_id FROM products WHERE status != 'done' AND attempts < ? ORDER BY rowid",
+                (max_attempts,),
+            )
+            return [row[0] for row in rows]
+
+    def mark_done(self, prod_ids: List[str], stream_lines: Optional[int] = None,
+                  parquet_parts: Optional[int] = None) -> None:
+        """Mark prodIds done; `stream_lines`/`parquet_parts` say how much output is on disk with them, so a resume can cut back to it."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE products SET status = 'done', last_error = NULL, updated_at = ? WHERE prod_id = ?",
+                [(time.time(), pid) for pid in prod_ids],
+            )
+            for key, value in (("stream_lines", stream_lines), ("parquet_parts", parquet_parts)):
+                if value is not None:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def mark_failed(self, prod_ids: List[str], error: str) -> None:
+        """Count one failed attempt for every listed prodId that is not done."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE products SET status = 'failed', attempts = attempts + 1, last_error = ?, updated_at = ? "
+                "WHERE prod_id = ? AND status != 'done'",
+                [(error, time.time(), pid) for pid in prod_ids],
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM products GROUP BY status").fetchall())
+
+    def done_ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT prod_id FROM products WHERE status = 'done'")}
+
+    # --- change detection ---
+    def fingerprints(self) -> Dict[str, Tuple[str, Optional[str], Optional[str]]]:
+        """prodId -> (content_hash, etag, last_modified) from earlier runs."""
+        with self._lock:
+            rows = self._conn.execute("SELECT prod_id, content_hash, etag, last_modified FROM fingerprints")
+            return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def save_fingerprints(self, rows: List[Tuple[str, str, Optional[str], Optional[str]]]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (prod_id, content_hash, etag, last_modified, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+
+    def delete_fingerprints(self, prod_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM fingerprints WHERE prod_id = ?", [(pid,) for pid in prod_ids])
+
+    # --- listing-level fields (--refresh) ---
+    def listing_snapshots(self) -> Dict[str, str]:
+        """prodId -> hash of the listing fields its stored record was last built or refreshed from."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT prod_id, fields_hash FROM listing_snapshots").fetchall())
+
+    def save_listing_snapshots(self, items: Dict[str, Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO listing_snapshots (prod_id, fields_hash, fields, updated_at) VALUES (?, ?, ?, ?)",
+                [(pid, hash_listing_fields(fields), dumps_json(fields), now) for pid, fields in items.items()],
+            )
+
+
+# ========== Incremental Re-scrape (change detection) ==========
+def hash_model_data(json_text: str) -> str:
+    return hashlib.blake2b(json_text.encode("utf-8"), digest_size=16).hexdigest()
+
+class ChangeTracker:
+    """Diffs each PDP's modelData hash against the last run; new hashes are saved once their record is flushed."""
+
+    def __init__(self, state: CrawlState, feed_path: str = CHANGE_FEED, mode: str = "w"):
+        self.state = state
+        self.known = state.fingerprints()
+        self.feed = JsonlWriter(feed_path, mode=mode)
+        self.stats = {"added": 0, "changed": 0, "unchanged": 0, "not_modified": 0, "removed": 0}
+        self._staged: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def request_headers(self, prod_id: str) -> Dict[str, str]:
+        """Conditional-request validators saved from the previous run."""
+        known = self.known.get(prod_id)
+        headers: Dict[str, str] = {}
+        if known and known[1]:
+            headers["If-None-Match"] = known[1]
+        if known and known[2]:
+            headers["If-Modified-Since"] = known[2]
+        return headers
+
+    def is_unchanged(self, prod_id: str, content_hash: str) -> bool:
+        known = self.known.get(prod_id)
+        return known is not None and known[0] == content_hash
+
+    def unchanged(self, prod_id: str, not_modified: bool = False) -> None:
+        with self._lock:
+            self.stats["not_modified" if not_modified else "unchanged"] += 1
+        self.state.mark_done([prod_id])
+
+    def stage(self, prod_id: str, content_hash: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> None:
+        with self._lock:
+            self._staged[prod_id] = (content_hash, etag, last_modified)
+
+    def commit(self, prod_ids: List[str]) -> None:
+        """Persist fingerprints and feed lines for products whose records are on disk."""
+        rows = []
+        with self._lock:
+            for pid in prod_ids:
+                staged = self._staged.pop(pid, None)
+                if staged is None:
+                    continue
+                change = "changed" if pid in self.known else "added"
+                self.stats[change] += 1
+                self.feed.write({"prodId": pid, "change": change})
+                rows.append((pid, *staged))
+        self.feed.flush()
+        self.state.save_fingerprints(rows)
+
+    def carry_forward(self, previous: str, output: str, emit: ProductSink) -> int:
+        """Emit the previous record of each done product the output lacks (the unchanged ones); return how many."""
+        missing = self.state.done_ids() - {rec.get("prodId") for rec in iter_jsonl(output)}
+        carried = 0
+        for rec in iter_jsonl(previous):
+            pid = rec.get("prodId")
+            if pid in missing:
+                missing.discard(pid)
+                emit(pid, ProductRecord.from_dict(rec))
+                carried += 1
+        return carried
+
+    def finish(self, current_ids: List[str]) -> Dict[str, int]:
+        """Report products that dropped out of the listing, close the feed, return counts."""
+        removed = sorted(set(self.known) - set(current_ids))
+        for pid in removed:
+            self.feed.write({"prodId": pid, "change": "removed"})
+        self.state.delete_fingerprints(removed)
+        self.stats["removed"] = len(removed)
+        self.feed.close()
+        return dict(self.stats)
+
+
+# ========== Response Cache (content-addressed, offline replay) ==========
+class CachedResponse(NamedTuple):
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+class ResponseCache:
+    """Compressed, content-addressed store of listing payloads and PDP modelData, indexed by URL in SQLite."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_kind ON responses (kind, key);
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.suffix = ".zst" if zstandard is not None else ".gz"
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _object_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest + suffix)
+
+    def _write_object(self, data: bytes) -> str:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        path = self._object_path(digest, self.suffix)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            packed = zstandard.ZstdCompressor().compress(data) if self.suffix == ".zst" else gzip.compress(data)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(packed)
+            os.replace(tmp, path)
+        return digest
+
+    def read(self, digest: str) -> Optional[str]:
+        for suffix in (".zst", ".gz"):
+            path = self._object_path(digest, suffix)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    packed = f.read()
+                if suffix == ".zst":
+                    if zstandard is None:
+                        raise RuntimeError("this cache holds zstd objects; install the 'zstandard' package")
+                    return zstandard.ZstdDecompressor().decompress(packed).decode("utf-8")
+                return gzip.decompress(packed).decode("utf-8")
+        return None
 
-    time.sleep(2)
+    def put(self, url: str, kind: str, key: str, text: str,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        digest = self._write_object(text.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, kind, key, digest, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (url, kind, key, digest, etag, last_modified, time.time()))
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """The cached body for `url` if it is younger than the TTL, else None."""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, digest, etag, last_modified FROM responses WHERE url = ? AND fetched_at >= ?",
+                (url, time.time() - self.ttl)).fetchone()
+        text = self.read(row[1]) if row else None
+        METRICS.inc("cache_lookups_total", kind=row[0] if row else "any", result="hit" if text is not None else "miss")
+        return CachedResponse(text, row[2], row[3]) if text is not None else None
+
+    def keys(self, kind: str) -> List[Tuple[str, str]]:
+        """(key, digest) of every cached entry of `kind`, ignoring the TTL."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, digest FROM responses WHERE kind = ? ORDER BY key", (kind,)).fetchall()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT kind, COUNT(*) FROM responses GROUP BY kind").fetchall())
+
+def replay_cache(cache: ResponseCache, normalizer: InlineNormalizer) -> int:
+    """Re-normalize every cached PDP modelData with no network; return the blobs submitted."""
+    submitted = 0
+    for prod_id, digest in cache.keys("pdp"):
+        json_text = cache.read(digest)
+        if json_text is None:
+            print(f"Product {prod_id}: cached object {digest} is missing")
+            continue
+        normalizer.submit(prod_id, json_text)
+        submitted += 1
+    normalizer.join()
+    return submitted
+
+
+# ========== Normalization Stage ==========
+def parse_model_data(json_text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """json.loads the modelData text; None unless it carries a pageData.product."""
+    if not json_text:
+        return None
+    try:
+        with METRICS.timer("json_loads"):
+            data = loads_json(json_text)
+    except ValueError:
+        return None
+    if not isinstance(deep_get(data, ["pageData", "product"]), dict):
+        return None
+    return data
 
-    # Load product IDs from JSON file
-    with open(PRODUCT_IPS, "r", encoding="utf-8") as f:
-        prod_ids = json.load(f)
+def normalize_product(prod_id: str, data: Dict[str, Any]) -> Optional[ProductRecord]:
+    try:
+        with METRICS.timer("build_output"):
+            return build_output(data)
+    except Exception as e:
+        print(f"Product {prod_id}: Error processing data - {str(e)}")
+        return None
 
-    # Initialize the browser page
-    page = ChromiumPage()
+def process_pdp(prod_id: str, json_text: Optional[str], emit: ProductSink,
+                tracker: Optional[ChangeTracker] = None,
+                etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+    """Hash-check, parse and normalize one PDP's modelData; False if it had no usable product data."""
+    content_hash = hash_model_data(json_text) if (tracker and json_text) else None
+    if content_hash and tracker.is_unchanged(prod_id, content_hash):
+        tracker.unchanged(prod_id)
+        return True
+    data = parse_model_data(json_text)
+    if data is None:
+        return False
+    normalized = normalize_product(prod_id, data)
+    if normalized is not None:
+        if tracker:
+            tracker.stage(prod_id, content_hash, etag, last_modified)
+        emit(prod_id, normalized)
+    return True
+
+def worker_stats() -> Any:
+    """Metrics recorded in this process since the last call."""
+    return METRICS.drain()
+
+def merge_worker_stats(stats: Any) -> None:
+    METRICS.merge(stats)
+
+def normalize_model_data(json_text: str) -> Tuple[str, Any, Any]:
+    """Process-pool entry point: json.loads + build_output; returns (status, product or error, worker metrics)."""
+    data = parse_model_data(json_text)
+    if data is None:
+        return "unusable", None, worker_stats()
+    try:
+        with METRICS.timer("build_output"):
+            product = build_output(data)
+    except Exception as e:
+        return "error", str(e), worker_stats()
+    return "ok", product, worker_stats()
+
+UnusableHook = Optional[Callable[[str], None]]
+
+class InlineNormalizer:
+    """Normalizes each PDP in the caller's thread, as soon as it is submitted."""
+
+    def __init__(self, emit: ProductSink, tracker: Optional[ChangeTracker] = None):
+        self.emit = emit
+        self.tracker = tracker
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, prod_id: str, json_text: Optional[str], etag: Optional[str] = None,
+               last_modified: Optional[str] = None, on_unusable: UnusableHook = None) -> None:
+        if not process_pdp(prod_id, json_text, self.emit, self.tracker, etag, last_modified) and on_unusable:
+            on_unusable(prod_id)
+
+    async def submit_async(self, prod_id: str, json_text: Optional[str], etag: Optional[str] = None,
+                           last_modified: Optional[str] = None, on_unusable: UnusableHook = None) -> None:
+        self.submit(prod_id, json_text, etag, last_modified, on_unusable)
+
+    def join(self) -> None:
+        """Wait until every submitted PDP has been emitted or rejected."""
+
+    def close(self) -> None:
+        pass
+
+class ProcessNormalizer(InlineNormalizer):
+    """Bounded process-pool normalization stage; `emit` runs on the pool's callback thread, so must be thread-safe."""
+
+    def __init__(self, emit: ProductSink, tracker: Optional[ChangeTracker] = None,
+                 processes: int = NORMALIZE_PROCESSES, max_pending: int = NORMALIZE_MAX_PENDING):
+        super().__init__(emit, tracker)
+        self.processes = processes
+        self._executor = self._new_pool()
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._idle = threading.Condition()
+        self._in_flight = 0
+
+    def submit(self, prod_id: str, json_text: Optional[str], etag: Optional[str] = None,
+               last_modified: Optional[str] = None, on_unusable: UnusableHook = None) -> None:
+        self._slots.acquire()
+        self._dispatch(prod_id, json_text, etag, last_modified, on_unusable)
+
+    async def submit_async(self, prod_id: str, json_text: Optional[str], etag: Optional[str] = None,
+                           last_modified: Optional[str] = None, on_unusable: UnusableHook = None) -> None:
+        if not self._slots.acquire(blocking=False):
+            await asyncio.to_thread(self._slots.acquire)
+        self._dispatch(prod_id, json_text, etag, last_modified, on_unusable)
+
+    def _dispatch(self, prod_id: str, json_text: Optional[str], etag: Optional[str],
+                  last_modified: Optional[str], on_unusable: UnusableHook) -> None:
+        # The hash check is cheap and saves shipping unchanged blobs to a worker
+        content_hash = hash_model_data(json_text) if (self.tracker and json_text) else None
+        if content_hash and self.tracker.is_unchanged(prod_id, content_hash):
+            self.tracker.unchanged(prod_id)
+            self._slots.release()
+            return
+        if not json_text:
+            self._slots.release()
+            if on_unusable:
+                on_unusable(prod_id)
+            return
+        with self._idle:
+            self._in_flight += 1
+            METRICS.gauge("queue_depth", self._in_flight, queue="normalize_pending")
+        try:
+            future = self._submit(json_text)
+        except BaseException:
+            # Never scheduled: give back the slot so join() does not wait on it
+            self._done_one()
+            raise
+        future.add_done_callback(
+            lambda f: self._finish(f, prod_id, content_hash, etag, last_modified, on_unusable))
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Forked workers start with a copy of the parent's counters; drop it so nothing is counted twice
+        return ProcessPoolExecutor(max_workers=self.processes, initializer=worker_stats)
+
+    def _submit(self, json_text: str) -> Future:
+        """Submit to the pool, replacing it once if a worker died (OOM kill, segfault) and broke it."""
+        executor = self._executor
+        try:
+            return executor.submit(normalize_model_data, json_text)
+        except BrokenProcessPool:
+            with self._pool_lock:
+                if self._executor is executor:
+                    print("Normalization pool broke (a worker process died); starting a new one")
+                    executor.shutdown(wait=False)
+                    self._executor = self._new_pool()
+            return self._executor.submit(normalize_model_data, json_text)
+
+    def _done_one(self) -> None:
+        self._slots.release()
+        with self._idle:
+            self._in_flight -= 1
+            METRICS.gauge("queue_depth", self._in_flight, queue="normalize_pending")
+            self._idle.notify_all()
+
+    def _finish(self, future: Future, prod_id: str, content_hash: Optional[str], etag: Optional[str],
+                last_modified: Optional[str], on_unusable: UnusableHook) -> None:
+        try:
+            status, payload, stats = future.result()
+            merge_worker_stats(stats)
+            if status == "ok":
+                if self.tracker:
+                    self.tracker.stage(prod_id, content_hash, etag, last_modified)
+                self.emit(prod_id, payload)
+            elif status == "unusable":
+                if on_unusable:
+                    on_unusable(prod_id)
+            else:
+                print(f"Product {prod_id}: Error processing data - {payload}")
+        except Exception as e:
+            print(f"Product {prod_id}: Normalization failed - {str(e)}")
+        finally:
+            self._done_one()
+
+    def join(self) -> None:
+        with self._idle:
+            self._idle.wait_for(lambda: self._in_flight == 0)
+
+    def close(self) -> None:
+        self.join()
+        self._executor.shutdown()
+
+def make_normalizer(emit: ProductSink, tracker: Optional[ChangeTracker] = None,
+                    processes: int = NORMALIZE_PROCESSES) -> InlineNormalizer:
+    if processes > 0:
+        return ProcessNormalizer(emit, tracker, processes=processes)
+    return InlineNormalizer(emit, tracker)
+
+
+# ========== PDP Fetching ==========
+class PdpResponse(NamedTuple):
+    status: int
+    json_text: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+def fetch_pdp_http(session: requests.Session, prod_id: str, limiter: Optional[RateLimiter] = None,
+                   headers: Optional[Dict[str, str]] = None, cache: Optional[ResponseCache] = None) -> PdpResponse:
+    """GET the PDP through the pooled session (or take it from `cache`) and pull out its modelData text."""
+    url = PDP_URL_TMPL.format(prod_id)
+    cached = cache.get(url) if cache else None
+    if cached is not None:
+        return PdpResponse(200, *cached)
+    r = limited_get(session, url, limiter, headers=headers, stage="pdp")
+    return pdp_response(cache, prod_id, r.status_code, r.text, r.headers)
+
+def pdp_response(cache: Optional[ResponseCache], prod_id: str, status: int, body: str,
+                 headers: Mapping[str, str]) -> PdpResponse:
+    """PdpResponse for a freshly fetched PDP, cached when it has modelData; shared by both engines."""
+    if status != 200:
+        return PdpResponse(status, None)
+    return cache_pdp(cache, PDP_URL_TMPL.format(prod_id), prod_id,
+                     PdpResponse(200, extract_model_data_json(body), headers.get("ETag"), headers.get("Last-Modified")))
+
+def cache_pdp(cache: Optional[ResponseCache], url: str, prod_id: str, resp: PdpResponse) -> PdpResponse:
+    if cache and resp.json_text:
+        cache.put(url, "pdp", prod_id, resp.json_text, resp.etag, resp.last_modified)
+    return resp
+
+class PdpBatch:
+    """Per-result handling of an HTTP PDP run, shared by the thread and async engines."""
+
+    def __init__(self, prod_ids: List[str], tracker: Optional[ChangeTracker] = None):
+        self.total = len(prod_ids)
+        self.pending = iter(prod_ids)
+        self.tracker = tracker
+        self.fetched = 0
+        self.needs_browser: List[str] = []
+
+    def headers(self, prod_id: str) -> Optional[Dict[str, str]]:
+        return self.tracker.request_headers(prod_id) if self.tracker else None
+
+    def result(self, prod_id: str, future: Any) -> Optional[PdpResponse]:
+        """The response to normalize from a finished fetch, or None (failed: browser fallback; 304: unchanged)."""
+        self.fetched += 1
+        try:
+            resp = future.result()
+        except Exception as e:
+            print(f"Product {prod_id}: HTTP fetch failed - {str(e)}")
+            self.needs_browser.append(prod_id)
+            return None
+        print(f"HTTP product {self.fetched}/{self.total}: {prod_id}")
+        if resp.status == 304 and self.tracker:
+            self.tracker.unchanged(prod_id, not_modified=True)
+            return None
+        return resp
+
+    def outcome(self) -> Tuple[int, List[str]]:
+        """(products handled, prodIds that need the browser)."""
+        return self.total - len(self.needs_browser), self.needs_browser
+
+def scrape_pdps_http(
+    prod_ids: List[str],
+    emit: ProductSink,
+    max_workers: int = PDP_WORKERS,
+    limiter: Optional[RateLimiter] = None,
+    tracker: Optional[ChangeTracker] = None,
+    normalizer: Optional[InlineNormalizer] = None,
+    cache: Optional[ResponseCache] = None,
+    pool: Optional[SessionPool] = None,
+) -> Tuple[int, List[str]]:
+    """Fetch PDPs over plain HTTP into the normalizer; return (products handled, prodIds that need the browser)."""
+    session, limiter = thread_session(pool, limiter, max_workers)
+    normalizer = normalizer or InlineNormalizer(emit, tracker)
+    batch = PdpBatch(prod_ids, tracker)
 
-    # List to store all product data (now: normalized dicts from build_output)
-    all_products_data = []
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures: Dict[Future, str] = {}
 
-    for idx, prod_id in enumerate(prod_ids, 1):
+        # A bounded window of fetches, so a slow normalizer holds back the fetchers too
+        def fill() -> None:
+            for pid in batch.pending:
+                futures[ex.submit(fetch_pdp_http, session, pid, limiter, batch.headers(pid), cache)] = pid
+                if len(futures) >= 2 * max_workers:
+                    break
+            METRICS.gauge("queue_depth", len(futures), queue="pdp_in_flight")
+
+        fill()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                prod_id = futures.pop(future)
+                resp = batch.result(prod_id, future)
+                if resp:
+                    normalizer.submit(prod_id, resp.json_text, resp.etag, resp.last_modified,
+                                      batch.needs_browser.append)
+            fill()
+
+    normalizer.join()
+    return batch.outcome()
+
+class ChromiumTabPool:
+    """Chromium tabs fed from one work queue, replaced when they fail; use as a context manager."""
+
+    def __init__(self, tabs: int = BROWSER_TABS, limiter: Optional[RateLimiter] = None,
+                 max_attempts: int = BROWSER_MAX_ATTEMPTS, cache: Optional[ResponseCache] = None):
+        self.size = max(1, tabs)
+        self.limiter = limiter or RateLimiter()
+        self.max_attempts = max_attempts
+        self.cache = cache
+        self.page: Optional[ChromiumPage] = None
+        self._tab_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._rendered = 0
+        self._restarts = 0
+        self._stop = threading.Event()
+
+    def __enter__(self) -> "ChromiumTabPool":
+        self.page = ChromiumPage()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self.page is not None:
+            try:
+                self.page.quit()
+            except Exception as e:
+                print(f"Browser shutdown error - {str(e)}")
+            self.page = None
+
+    def _open_tab(self):
+        # Tab creation goes through the shared browser connection
+        with self._tab_lock:
+            return self.page.new_tab()
+
+    def _restart(self, dead) -> bool:
+        """Relaunch the browser unless another worker already did; False once restarts are used up."""
+        with self._tab_lock:
+            if self.page is not dead:
+                return self.page is not None
+            if self._stop.is_set() or self._restarts >= BROWSER_RESTARTS:
+                return False
+            self._restarts += 1
+            try:
+                dead.quit()
+            except Exception:
+                pass
+            try:
+                self.page = ChromiumPage()
+            except Exception as e:
+                print(f"Browser restart failed - {str(e)}")
+                return False
+            print(f"Browser restarted ({self._restarts}/{BROWSER_RESTARTS})")
+            return True
+
+    def _new_tab(self):
+        """A fresh tab, relaunching the browser if it no longer opens any; None when it cannot be brought back."""
+        while True:
+            page = self.page
+            try:
+                return self._open_tab()
+            except Exception as e:
+                print(f"Browser could not open a tab - {str(e)}")
+                if not self._restart(page):
+                    return None
+
+    def _recycle(self, tab):
         try:
-            # Navigate to the product URL
-            url = f'https://www.rei.com/product/{prod_id}'
-            random_sleep(5, 8)
-            page.get(url)
-            
-            # Print the page title to confirm
-            print(f"Processing product {idx}/{len(prod_ids)}: {prod_id} - {page.title}")
-            random_sleep(5, 8)
-
-            # Parse HTML with BeautifulSoup
-            soup = BeautifulSoup(page.html, 'html.parser')
-
-            # Find the script tag with id="modelData"
-            model_data_script = soup.find('script', id='modelData')
-            if model_data_script:
-                json_text = model_data_script.string
+            tab.close()
+        except Exception:
+            pass
+        return self._new_tab()
+
+    def _render(self, tab, prod_id: str) -> Optional[str]:
+        """Load one PDP in `tab` and return its modelData text; raise if navigation itself failed."""
+        url = PDP_URL_TMPL.format(prod_id)
+        if tab.get(url) is False:
+            raise RuntimeError("page load failed")
+        json_text = extract_model_data_json(tab.html)
+        if not json_text:
+            print(f"Product {prod_id}: modelData script tag not found on the page.")
+        return cache_pdp(self.cache, url, prod_id, PdpResponse(200, json_text)).json_text
+
+    def _unusable(self, prod_id: str) -> None:
+        print(f"Product {prod_id}: modelData has no usable product data.")
+
+    def _worker(self, work: "queue.Queue[Tuple[str, int]]", normalizer: InlineNormalizer, total: int) -> None:
+        tab = self._new_tab()
+        try:
+            while tab is not None and not self._stop.is_set():
+                try:
+                    prod_id, attempt = work.get_nowait()
+                except queue.Empty:
+                    return
+                METRICS.gauge("queue_depth", work.qsize(), queue="browser_pending")
+                self.limiter.acquire()
                 try:
-                    # Parse the JSON text
-                    product_data = json.loads(json_text)
+                    json_text = self._render(tab, prod_id)
+                except Exception as e:
+                    print(f"Product {prod_id}: Failed to process (attempt {attempt}) - {str(e)}")
+                    if attempt < self.max_attempts:
+                        work.put((prod_id, attempt + 1))
+                    tab = self._recycle(tab)
+                    continue
+                with self._count_lock:
+                    self._rendered += 1
+                    print(f"Processing product {self._rendered}/{total}: {prod_id} - {tab.title}")
+                if json_text:
+                    normalizer.submit(prod_id, json_text, on_unusable=self._unusable)
+        finally:
+            if tab is not None:
+                try:
+                    tab.close()
+                except Exception:
+                    pass
+
+    def run(self, prod_ids: List[str], normalizer: InlineNormalizer) -> int:
+        """Render every prodId across the pool and hand each modelData to `normalizer`; return pages rendered."""
+        self._rendered = 0
+        work: "queue.Queue[Tuple[str, int]]" = queue.Queue()
+        for pid in prod_ids:
+            work.put((pid, 1))
+
+        workers = [
+            threading.Thread(target=self._worker, args=(work, normalizer, len(prod_ids)), daemon=True)
+            for _ in range(min(self.size, len(prod_ids)))
+        ]
+        for t in workers:
+            t.start()
+        try:
+            for t in workers:
+                t.join()
+        except KeyboardInterrupt:
+            # Let in-flight tabs finish their current product, then stop
+            self._stop.set()
+            for t in workers:
+                t.join()
+            raise
+        # Workers only leave work behind when the browser could not be brought back
+        left = 0
+        while True:
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                break
+            left += 1
+        if left:
+            print(f"Browser unavailable: {left} PDPs were not rendered")
+        return self._rendered
+
+def scrape_pdps_browser(prod_ids: List[str], emit: ProductSink, tabs: int = BROWSER_TABS,
+                        limiter: Optional[RateLimiter] = None, tracker: Optional[ChangeTracker] = None,
+                        normalizer: Optional[InlineNormalizer] = None, cache: Optional[ResponseCache] = None) -> int:
+    """Render PDPs in a pool of Chromium tabs, normalizing each one; return pages rendered."""
+    if not prod_ids:
+        return 0
+    normalizer = normalizer or InlineNormalizer(emit, tracker)
+    with ChromiumTabPool(tabs=tabs, limiter=limiter, cache=cache) as pool:
+        rendered = pool.run(prod_ids, normalizer)
+    normalizer.join()
+    return rendered
+
+
+# ========== Asyncio Engine (listings + HTTP PDPs) ==========
+def retry_backoff(consecutive_errors: int) -> float:
+    """urllib3's Retry backoff: no sleep before the first retry, then factor * 2**(n-1)."""
+    if consecutive_errors <= 1:
+        return 0.0
+    return min(120.0, RETRY_BACKOFF * (2 ** (consecutive_errors - 1)))
+
+class AsyncFetcher:
+    """aiohttp client with make_session's retry and backoff rules, drawing on the shared RateLimiter."""
+
+    def __init__(self, concurrency: int = ASYNC_CONCURRENCY, per_host: int = ASYNC_PER_HOST,
+                 limiter: Optional[RateLimiter] = None):
+        if aiohttp is None:
+            raise RuntimeError("the async engine requires the 'aiohttp' package")
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.limiter = limiter or RateLimiter()
+        self.session: Optional["aiohttp.ClientSession"] = None
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT[0], sock_read=REQUEST_TIMEOUT[1])
+        self.session = aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+                  stage: str = "http") -> Tuple[int, str, Dict[str, str]]:
+        """GET `url`; return (status, body text, response headers)."""
+        errors = 0
+        while True:
+            await self.limiter.acquire_async()
+            t0 = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers) as resp:
+                    raw = await resp.read()
+                    body = raw.decode(resp.get_encoding(), errors="replace")
+                    status, resp_headers = resp.status, dict(resp.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                METRICS.stage_done("fetch", time.perf_counter() - t0)
+                METRICS.inc("request_errors_total", stage=stage)
+                errors += 1
+                if errors > RETRY_TOTAL:
+                    raise
+                METRICS.inc("retries_total", reason="error")
+                await self._backoff(retry_backoff(errors))
+                continue
+            elapsed = time.perf_counter() - t0
+            METRICS.stage_done("fetch", elapsed)
+            METRICS.request(stage, elapsed, status, len(raw))
+            retry_after = resp_headers.get("Retry-After")
+            self.limiter.record(status, retry_after)
+            if status not in RETRY_STATUSES or errors >= RETRY_TOTAL:
+                return status, body, resp_headers
+            errors += 1
+            METRICS.inc("retries_total", reason=status)
+            delay = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+            await self._backoff(delay if delay is not None else retry_backoff(errors))
+
+    @staticmethod
+    async def _backoff(delay: float) -> None:
+        if delay:
+            METRICS.inc("sleep_seconds_total", delay, reason="retry_backoff")
+        await asyncio.sleep(delay)
+
+async def fetch_listing_async(fetcher: AsyncFetcher, page_number: int, category: str = CATEGORIES[0],
+                              cache: Optional[ResponseCache] = None,
+                              items: ListingItems = None) -> Tuple[List[str], Optional[int]]:
+    """Async `fetch_listing`: (prodIds found, total page count if the payload says)."""
+    url = listing_url(category, page_number)
+    cached = cache.get(url) if cache else None
+    if cached is not None:
+        return listing_result(category, page_number, 200, cached.text, items)
+    status, body, _ = await fetcher.get(url, stage="listing")
+    return listing_response(cache, category, page_number, status, body, items)
+
+async def fetch_page_async(fetcher: AsyncFetcher, page_number: int, category: str = CATEGORIES[0]) -> List[str]:
+    """Async `fetch_page`: fetch one page and return the prodIds found."""
+    return (await fetch_listing_async(fetcher, page_number, category))[0]
+
+async def collect_prod_ids_async(
+    target_count: int = TARGET_COUNT,
+    start_page: int = 1,
+    concurrency: int = ASYNC_CONCURRENCY,
+    max_empty: int = MAX_EMPTY_PAGES,
+    limiter: Optional[RateLimiter] = None,
+    state: Optional[CrawlState] = None,
+    categories: Optional[List[str]] = None,
+    per_host: int = ASYNC_PER_HOST,
+    cache: Optional[ResponseCache] = None,
+    items: ListingItems = None,
+) -> List[str]:
+    """`collect_prod_ids` on a single event loop, with up to `concurrency` pages in flight."""
+    crawl = ListingCollector(categories, start_page, max_empty, state, target_count)
 
-                    normalized = build_output(product_data)
-                    all_products_data.append(normalized)
+    async with AsyncFetcher(concurrency, per_host, limiter) as fetcher:
+        tasks: Dict["asyncio.Task", Tuple[str, int]] = {}
 
-                except json.JSONDecodeError:
-                    print(f"Product {prod_id}: Error parsing JSON from modelData script tag.")
-                except Exception as e:
-                    print(f"Product {prod_id}: Error processing data - {str(e)}")
+        def fill() -> None:
+            while len(tasks) < concurrency:
+                task = crawl.next_page()
+                if task is None:
+                    break
+                category, page = task
+                tasks[asyncio.ensure_future(fetch_listing_async(fetcher, page, category, cache, items))] = task
+            METRICS.gauge("queue_depth", len(tasks), queue="listing_in_flight")
+
+        fill()
+        while tasks:
+            finished, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for t in finished:
+                crawl.result(*tasks.pop(t), t)
+            fill()
+
+    return crawl.finish()
+
+async def fetch_pdp_async(fetcher: AsyncFetcher, prod_id: str, headers: Optional[Dict[str, str]] = None,
+                          cache: Optional[ResponseCache] = None) -> PdpResponse:
+    """Async `fetch_pdp_http`: GET the PDP (or take it from `cache`) and pull out its modelData text."""
+    url = PDP_URL_TMPL.format(prod_id)
+    cached = cache.get(url) if cache else None
+    if cached is not None:
+        return PdpResponse(200, *cached)
+    status, body, resp_headers = await fetcher.get(url, headers=headers, stage="pdp")
+    return pdp_response(cache, prod_id, status, body, resp_headers)
+
+async def scrape_pdps_async(
+    prod_ids: List[str],
+    emit: ProductSink,
+    concurrency: int = ASYNC_CONCURRENCY,
+    limiter: Optional[RateLimiter] = None,
+    tracker: Optional[ChangeTracker] = None,
+    per_host: int = ASYNC_PER_HOST,
+    normalizer: Optional[InlineNormalizer] = None,
+    cache: Optional[ResponseCache] = None,
+) -> Tuple[int, List[str]]:
+    """`scrape_pdps_http` on a single event loop. Returns (products handled, prodIds that need the browser)."""
+    normalizer = normalizer or InlineNormalizer(emit, tracker)
+    batch = PdpBatch(prod_ids, tracker)
+
+    async with AsyncFetcher(concurrency, per_host, limiter) as fetcher:
+        tasks: Dict["asyncio.Task", str] = {}
+
+        # Only `concurrency` coroutines exist at a time, however long the list
+        def fill() -> None:
+            for pid in batch.pending:
+                tasks[asyncio.ensure_future(fetch_pdp_async(fetcher, pid, batch.headers(pid), cache))] = pid
+                if len(tasks) >= concurrency:
+                    break
+            METRICS.gauge("queue_depth", len(tasks), queue="pdp_in_flight")
+
+        fill()
+        while tasks:
+            finished, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for t in finished:
+                prod_id = tasks.pop(t)
+                resp = batch.result(prod_id, t)
+                if resp:
+                    await normalizer.submit_async(prod_id, resp.json_text, resp.etag, resp.last_modified,
+                                                  batch.needs_browser.append)
+            fill()
+
+    await asyncio.to_thread(normalizer.join)
+    return batch.outcome()
+
+
+# ========== Distributed Work Queue (coordinator/workers) ==========
+class Lease(NamedTuple):
+    lease_id: str
+    prod_ids: List[str]
+
+class WorkQueue:
+    """SQLite broker: leases batches of prodIds to PDP workers and collects their reports for the coordinator."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS tasks (
+            prod_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_id TEXT,
+            lease_expires REAL,
+            last_error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS tasks_lease ON tasks (lease_id);
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prod_id TEXT NOT NULL,
+            worker TEXT,
+            record TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = QUEUE_DB, max_attempts: int = PDP_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- coordinator ---
+    def reset(self) -> None:
+        """Empty the queue for a new run; workers still holding leases will have their reports dropped."""
+        with self._lock, self._conn:
+            for table in ("meta", "tasks", "results"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('run', ?)", (os.urandom(8).hex(),))
+
+    def enqueue(self, prod_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO tasks (prod_id) VALUES (?)", [(pid,) for pid in prod_ids])
+
+    def seal(self) -> None:
+        """No more prodIds are coming: workers exit once the queue is drained."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sealed', '1')")
+
+    def take_results(self, limit: int = 500) -> List[Tuple[str, ProductRecord]]:
+        """Remove and return up to `limit` reported products."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT id, prod_id, record FROM results ORDER BY id LIMIT ?",
+                                      (limit,)).fetchall()
+            if rows:
+                self._conn.execute("DELETE FROM results WHERE id <= ?", (rows[-1][0],))
+        return [(pid, ProductRecord.from_dict(loads_json(record))) for _, pid, record in rows]
+
+    # --- workers ---
+    def expire_leases(self) -> int:
+        """Put batches whose lease ran out back on the queue (or fail them when out of attempts)."""
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "UPDATE tasks SET attempts = attempts + 1, lease_id = NULL, worker = NULL, last_error = 'lease expired', "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END "
+                "WHERE status = 'leased' AND lease_expires < ?", (self.max_attempts, time.time())).rowcount
+        if expired:
+            METRICS.inc("queue_tasks_total", expired, outcome="expired")
+        return expired
+
+    def lease(self, worker: str, size: int = LEASE_SIZE, timeout: float = LEASE_TIMEOUT) -> Optional[Lease]:
+        self.expire_leases()
+        lease_id = os.urandom(8).hex()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_id = ?, lease_expires = ? WHERE prod_id IN "
+                "(SELECT prod_id FROM tasks WHERE status = 'queued' ORDER BY rowid LIMIT ?)",
+                (worker, lease_id, time.time() + timeout, size))
+            prod_ids = [row[0] for row in self._conn.execute(
+                "SELECT prod_id FROM tasks WHERE lease_id = ? ORDER BY rowid", (lease_id,))]
+        if not prod_ids:
+            return None
+        METRICS.inc("queue_tasks_total", len(prod_ids), outcome="leased")
+        return Lease(lease_id, prod_ids)
+
+    def renew(self, lease_id: str, timeout: float = LEASE_TIMEOUT) -> bool:
+        """Push the lease deadline out; False once the lease has been taken back."""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE tasks SET lease_expires = ? WHERE lease_id = ? AND status = 'leased'",
+                                      (time.time() + timeout, lease_id)).rowcount > 0
+
+    def complete(self, lease_id: str, worker: str, products: Dict[str, ProductRecord],
+                 failed: List[str], error: str = "no product data") -> int:
+        """Report a finished lease atomically; return how many of its reports were still current."""
+        accepted = retried = dead = 0
+        with self._lock, self._conn:
+            for pid, product in products.items():
+                if self._conn.execute("UPDATE tasks SET status = 'done', lease_id = NULL, last_error = NULL "
+                                      "WHERE prod_id = ? AND lease_id = ?", (pid, lease_id)).rowcount:
+                    self._conn.execute("INSERT INTO results (prod_id, worker, record) VALUES (?, ?, ?)",
+                                       (pid, worker, product.to_json()))
+                    accepted += 1
+            for pid in failed:
+                if self._conn.execute(
+                        "UPDATE tasks SET attempts = attempts + 1, lease_id = NULL, worker = NULL, last_error = ?, "
+                        "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END "
+                        "WHERE prod_id = ? AND lease_id = ?", (error, self.max_attempts, pid, lease_id)).rowcount:
+                    status = self._conn.execute("SELECT status FROM tasks WHERE prod_id = ?", (pid,)).fetchone()[0]
+                    retried += status == "queued"
+                    dead += status == "failed"
+        METRICS.inc("queue_tasks_total", accepted, outcome="done")
+        METRICS.inc("queue_tasks_total", retried, outcome="retried")
+        METRICS.inc("queue_tasks_total", dead, outcome="failed")
+        METRICS.inc("queue_tasks_total", len(products) + len(failed) - accepted - retried - dead, outcome="stale")
+        return accepted + retried + dead
+
+    # --- both ---
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            counts["results"] = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return counts
+
+    def outstanding(self) -> int:
+        """Tasks queued or leased, plus results the coordinator has not taken yet."""
+        counts = self.counts()
+        return counts.get("queued", 0) + counts.get("leased", 0) + counts["results"]
+
+    def finished(self) -> Optional[str]:
+        """The run id once the run is sealed and has nothing left to lease or hold (workers can exit), else None."""
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            busy = self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'leased')").fetchone()[0]
+        return meta.get("run", "") if "sealed" in meta and not busy else None
+
+class LeaseKeeper:
+    """Renews a lease from a background thread while its batch is being worked."""
+
+    def __init__(self, work_queue: WorkQueue, lease_id: str, timeout: float = LEASE_TIMEOUT):
+        self.work_queue = work_queue
+        self.lease_id = lease_id
+        self.timeout = timeout
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.timeout / 3):
+            if not self.work_queue.renew(self.lease_id, self.timeout):
+                self.lost = True
+                return
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def coordinate(work_queue: WorkQueue, prod_ids: List[str], emit: ProductSink, poll: float = QUEUE_POLL) -> int:
+    """Enqueue `prod_ids`, then emit what workers report until every task is done or failed."""
+    work_queue.enqueue(prod_ids)
+    work_queue.seal()
+    print(f"📮 Queued {len(prod_ids)} prodIds in '{work_queue.path}'; waiting for workers")
+    received = 0
+    last_report = time.monotonic()
+    while True:
+        results = work_queue.take_results()
+        for prod_id, product in results:
+            emit(prod_id, product)
+        received += len(results)
+        # The coordinator also takes back expired leases, so a queue whose workers all died still drains
+        work_queue.expire_leases()
+        counts = work_queue.counts()
+        METRICS.gauge("queue_depth", counts.get("queued", 0), queue="work_queued")
+        METRICS.gauge("queue_depth", counts.get("leased", 0), queue="work_leased")
+        if not results and not work_queue.outstanding():
+            break
+        if time.monotonic() - last_report >= 30:
+            print(f"Work queue: {counts}")
+            last_report = time.monotonic()
+        if not results:
+            time.sleep(poll)
+    return received
+
+def run_worker(work_queue: WorkQueue, args: argparse.Namespace, limiter: RateLimiter,
+               cache: Optional[ResponseCache] = None, pool: Optional[SessionPool] = None,
+               poll: float = QUEUE_POLL) -> int:
+    """Lease, fetch and normalize batches until the coordinator's queue is sealed and drained."""
+    worker = args.worker_id
+    finished: Dict[str, ProductRecord] = {}
+    # A run already finished when we start is the previous one: wait for the coordinator to begin the next
+    stale_run = work_queue.finished()
+    if stale_run is not None:
+        print(f"👷 {worker}: '{work_queue.path}' holds a finished run; waiting for the coordinator to start one")
+
+    def emit(prod_id: str, product: ProductRecord) -> None:
+        finished[prod_id] = product
+
+    handled = 0
+    with make_normalizer(emit, processes=args.normalize_processes) as normalizer:
+        while True:
+            lease = work_queue.lease(worker, args.lease_size, args.lease_timeout)
+            if lease is None:
+                run = work_queue.finished()
+                if run is not None and run != stale_run:
+                    break
+                time.sleep(poll)
+                continue
+            with LeaseKeeper(work_queue, lease.lease_id, args.lease_timeout) as keeper:
+                if args.pdp_mode == "http":
+                    _, needs_browser = scrape_pdps_http(lease.prod_ids, emit, max_workers=args.pdp_workers,
+                                                        limiter=limiter, normalizer=normalizer, cache=cache,
+                                                        pool=pool)
+                else:
+                    needs_browser = list(lease.prod_ids)
+                scrape_pdps_browser(needs_browser, emit, tabs=args.browser_tabs, limiter=limiter,
+                                    normalizer=normalizer, cache=cache)
+            products = {pid: finished.pop(pid) for pid in lease.prod_ids if pid in finished}
+            failed = [pid for pid in lease.prod_ids if pid not in products]
+            if keeper.lost or not work_queue.complete(lease.lease_id, worker, products, failed):
+                print(f"Lease {lease.lease_id} was taken back before it finished; its results were dropped")
+                continue
+            handled += len(products)
+            print(f"👷 {worker}: lease of {len(lease.prod_ids)} done ({len(products)} products, "
+                  f"{len(failed)} failed; {handled} so far)")
+    return handled
+
+
+# ========== Price/Availability Refresh (listing JSON only) ==========
+def apply_listing_fields(record: Dict[str, Any], fields: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """Stored record with the listing's price/rating/availability values applied; (record, whether it changed)."""
+    updated = dict(record)
+    for section in ("price", "ratings"):
+        values = dict(updated.get(section) or {})
+        for key, value in fields[section].items():
+            if value is None:
+                continue  # the listing does not say
+            if value in EMPTY_VALUES:
+                values.pop(key, None)
             else:
-                print(f"Product {prod_id}: modelData script tag not found on the page.")
-            
-        except Exception as e:
-            print(f"Product {prod_id}: Failed to process - {str(e)}")
+                values[key] = value
+        updated[section] = values
+    # The listing only says available or not: keep a stored partial label unless it contradicts that
+    sold_out = availability_label(1, 1, 0)
+    if fields["available"] is False:
+        updated["availability"] = sold_out
+    elif fields["available"] is True and updated.get("availability") == sold_out:
+        updated["availability"] = availability_label(1, 0, 1)
+    # Keep the record's field order (skus last) and drop sections left empty
+    ordered = {k: updated[k] for k in ProductRecord.__slots__ if updated.get(k) not in EMPTY_VALUES}
+    ordered.update((k, v) for k, v in updated.items() if k not in ordered and k not in ProductRecord.__slots__)
+    return ordered, ordered != record
+
+def refresh_run(args: argparse.Namespace, limiter: RateLimiter, cache: Optional[ResponseCache],
+                pool: Optional[SessionPool]) -> None:
+    """Re-crawl the listings; fetch full PDPs only for new products and those whose listing fields changed."""
+    t0 = time.perf_counter()
+    state = CrawlState(args.state)
+    items: Dict[str, Dict[str, Any]] = {}
+    # Listing is not checkpointed: the pages a crawl has fetched must not be skipped here
+    if args.engine == "async":
+        prod_ids = asyncio.run(collect_prod_ids_async(target_count=args.target, concurrency=args.concurrency,
+                                                      limiter=limiter, categories=args.categories,
+                                                      cache=cache, items=items))
+    else:
+        prod_ids = collect_prod_ids(target_count=args.target, limiter=limiter, categories=args.categories,
+                                    cache=cache, pool=pool, items=items)
+    output = stream_path(args.output, args.compress)
+    stored = {rec.get("prodId") for rec in iter_jsonl(output)} if os.path.exists(output) else set()
+    snapshots = state.listing_snapshots()
+    new = [pid for pid in prod_ids if pid not in stored]
+    changed = [pid for pid in prod_ids if pid in stored and pid in items
+               and snapshots.get(pid) != hash_listing_fields(items[pid])]
+    print(f"🔄 Refresh: {len(prod_ids)} listed, {len(new)} new, {len(changed)} with changed price/rating/availability")
+
+    fresh: Dict[str, ProductRecord] = {}
+    listed_in = state.categories_of()
+
+    def emit(prod_id: str, product: ProductRecord) -> None:
+        product.prodId = prod_id
+        product.listingCategories = listed_in.get(prod_id)
+        fresh[prod_id] = product
+
+    scrape_here(args, new + changed, emit, limiter, None, cache, pool)
+    fetched = set(fresh)
+    # Records written before they carried a prodId are only known by productId; a fetched PDP replaces them
+    fetched_styles = {product.productId for product in fresh.values()}
+
+    suffix = COMPRESSION_SUFFIXES[compression_for(output)]
+    tmp = output[:len(output) - len(suffix)] + ".refresh" + suffix
+    changed_ids, patched = set(changed), 0
+    with JsonlWriter(tmp, mode="w") as writer:
+        if os.path.exists(output):
+            for rec in iter_jsonl(output):
+                pid = rec.get("prodId")
+                if pid is None and rec.get("productId") in fetched_styles:
+                    continue
+                if pid in fresh:
+                    writer.write(fresh.pop(pid))
+                    continue
+                if pid in changed_ids and pid in items:
+                    rec, did_change = apply_listing_fields(rec, items[pid])
+                    patched += did_change
+                writer.write(rec)
+        for product in fresh.values():
+            writer.write(product)
+    os.replace(tmp, output)
+
+    # A product whose PDP failed keeps its old snapshot, so the next refresh tries it again
+    need_pdp = set(new) | changed_ids
+    state.save_listing_snapshots({pid: f for pid, f in items.items() if pid not in need_pdp or pid in fetched})
+    state.close()
+    print(f"🔄 {len(fetched)}/{len(need_pdp)} full PDPs fetched, {patched} records updated from listing fields; "
+          f"{writer.count} products in '{output}' ({time.perf_counter() - t0:.1f}s)")
+
+
+# ========== Main Orchestration ==========
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Collect REI prodIds and scrape normalized product data.")
+    ap.add_argument("--categories", nargs="+", default=CATEGORIES, metavar="SLUG",
+                    help="category slugs to crawl (e.g. womens-t-shirts mens-jackets)")
+    ap.add_argument("--target", type=int, default=TARGET_COUNT, help="max prodIds to collect; 0 = no cap")
+    ap.add_argument("--pdp-mode", choices=("http", "browser"), default=PDP_MODE,
+                    help="http: pooled requests with browser fallback; browser: Chromium only")
+    ap.add_argument("--pdp-workers", type=int, default=PDP_WORKERS, help="HTTP PDP worker threads")
+    ap.add_argument("--engine", choices=("threads", "async"), default="threads",
+                    help="HTTP engine for listings and PDPs: thread pool or asyncio (needs aiohttp)")
+    ap.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY, help="in-flight requests for --engine async")
+    ap.add_argument("--normalize-processes", type=int, default=NORMALIZE_PROCESSES,
+                    help="processes running json.loads + build_output; 0 = inline in the fetch loop")
+    ap.add_argument("--browser-tabs", type=int, default=BROWSER_TABS, help="concurrent Chromium tabs")
+    ap.add_argument("--rate", type=float, default=RATE_INITIAL, help=f"initial request rate (req/s), adapted at runtime; also the ceiling when above {RATE_MAX:g}")
+    ap.add_argument("--output", default=OUTPUT_PRODUCT_STREAM, help="JSONL stream, one normalized product per line")
+    ap.add_argument("--compress", choices=tuple(COMPRESSION_SUFFIXES), default="none",
+                    help="compress the JSONL stream (adds .gz/.zst to --output)")
+    ap.add_argument("--state", default=STATE_DB, help="SQLite checkpoint used to resume interrupted runs")
+    ap.add_argument("--fresh", action="store_true", help="discard the checkpoint and start a new crawl")
+    ap.add_argument("--incremental", action="store_true",
+                    help="skip products whose modelData is unchanged since the last run and "
+                         f"write an added/changed/removed feed to {CHANGE_FEED}")
+    ap.add_argument("--parquet", metavar="DIR",
+                    help="also write products and flattened SKUs as Parquet datasets under DIR (needs pyarrow)")
+    ap.add_argument("--metrics-port", type=int, metavar="PORT",
+                    help="serve Prometheus metrics on :PORT/metrics (JSON at /metrics.json) during the run")
+    ap.add_argument("--metrics-host", default=METRICS_HOST, metavar="HOST",
+                    help=f"address --metrics-port binds to (default {METRICS_HOST}; 0.0.0.0 for all interfaces)")
+    ap.add_argument("--metrics-json", metavar="PATH",
+                    help=f"rewrite a JSON metrics snapshot to PATH every {METRICS_INTERVAL:g}s and at the end")
+    ap.add_argument("--pretty-json", action="store_true",
+                    help=f"also rebuild the indented JSON array in {OUTPUT_PRODUCT_DATA} from the stream")
+    ap.add_argument("--cache", nargs="?", const=CACHE_DIR, metavar="DIR",
+                    help=f"keep compressed listing/PDP responses in DIR (default {CACHE_DIR}) and reuse fresh ones")
+    ap.add_argument("--cache-ttl", type=float, default=CACHE_TTL, metavar="SECONDS",
+                    help="reuse cached responses younger than this; 0 = only store")
+    ap.add_argument("--replay", action="store_true",
+                    help="rebuild the outputs from every PDP in --cache without touching the network")
+    ap.add_argument("--role", choices=("single", "coordinator", "worker"), default="single",
+                    help="single: the whole pipeline here; coordinator: crawl listings, queue prodIds in --queue "
+                         "and write what workers report; worker: lease prodIds from --queue and scrape them")
+    ap.add_argument("--queue", default=QUEUE_DB, help="SQLite work queue shared by the coordinator and its workers")
+    ap.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="name this worker reports as")
+    ap.add_argument("--lease-size", type=int, default=LEASE_SIZE, help="prodIds a worker takes per lease")
+    ap.add_argument("--lease-timeout", type=float, default=LEASE_TIMEOUT, metavar="SECONDS",
+                    help="an unrenewed lease goes back on the queue after this long")
+    ap.add_argument("--identities", metavar="PATH",
+                    help="JSON list of client identities ({name, headers, user_agent, proxy, rate}); requests go "
+                         "to the healthiest one and identities that keep getting 403/429 are benched")
+    ap.add_argument("--proxies", nargs="+", metavar="URL", help="add one identity per proxy URL (default headers)")
+    ap.add_argument("--refresh", action="store_true",
+                    help="price/availability refresh: crawl listings only, update --output from the listing fields "
+                         "and fetch full PDPs just for new products and those whose listing fields changed")
+    args = ap.parse_args(argv)
+    if args.replay and not args.cache:
+        ap.error("--replay needs --cache")
+    if args.role == "coordinator" and args.incremental:
+        ap.error("--incremental is not supported with --role coordinator")
+    if (args.identities or args.proxies) and args.engine == "async":
+        ap.error("--identities/--proxies need --engine threads")
+    if args.refresh and (args.role != "single" or args.replay or args.incremental or args.parquet):
+        ap.error("--refresh runs on its own: not with --role, --replay, --incremental or --parquet")
+    return args
+
+def replay_run(args: argparse.Namespace, cache: ResponseCache) -> None:
+    """Offline re-normalization: cached modelData -> build_output -> fresh JSONL (and Parquet) outputs."""
+    output = stream_path(args.output, args.compress)
+    columnar = ParquetSink(args.parquet, mode="w") if args.parquet else None
+    listed_in = {}
+    if os.path.exists(args.state):
+        state = CrawlState(args.state)
+        listed_in = state.categories_of()
+        state.close()
+    t0 = time.perf_counter()
+    with JsonlWriter(output, mode="w") as writer:
+        def emit(prod_id: str, product: ProductRecord) -> None:
+            product.prodId = prod_id
+            product.listingCategories = listed_in.get(prod_id)
+            writer.write(product)
+            if columnar:
+                columnar.write(product, key=prod_id)
 
-    with open(OUTPUT_PRODUCT_DATA, 'w', encoding='utf-8') as json_file:
-        json.dump(all_products_data, json_file, indent=4)
-    print("All product data saved to 'extracted_product_info_all.json'")
+        try:
+            with make_normalizer(emit, processes=args.normalize_processes) as normalizer:
+                submitted = replay_cache(cache, normalizer)
+        finally:
+            if columnar:
+                columnar.close()
+    print(f"⏪ Replayed {submitted} cached PDPs from '{cache.directory}' in {time.perf_counter() - t0:.2f}s: "
+          f"{writer.count} products streamed to '{output}'")
+    if columnar:
+        print(f"🧱 Parquet: {columnar.count} products, {columnar.sku_count} SKUs -> '{args.parquet}'")
+
+def report_pool(pool: Optional[SessionPool]) -> None:
+    if not pool:
+        return
+    print("🪪 Identities at end of run:")
+    for row in pool.snapshot():
+        print(f"  {row['identity']}: health {row['health']:.2f}, {row['requests']} requests, "
+              f"rate {row['rate']:.2f} req/s, benched {row['times_benched']}x")
+
+def report_metrics(snapshotter: Optional[MetricsSnapshotter]) -> None:
+    print("📊 Run metrics:")
+    for line in METRICS.summary():
+        print(line)
+    if snapshotter:
+        snapshotter.stop()
+
+def scrape_here(args: argparse.Namespace, prod_ids: List[str], emit: ProductSink, limiter: RateLimiter,
+                tracker: Optional[ChangeTracker], cache: Optional[ResponseCache], pool: Optional[SessionPool]) -> None:
+    """PDP stage in this process: HTTP (thread or async engine) with browser fallback."""
+    # Fetchers hand raw modelData to the normalizer; parsing runs on its own processes
+    with make_normalizer(emit, tracker, processes=args.normalize_processes) as normalizer:
+        if args.pdp_mode == "http":
+            if args.engine == "async":
+                _, needs_browser = asyncio.run(scrape_pdps_async(
+                    prod_ids, emit, concurrency=args.concurrency, limiter=limiter, tracker=tracker,
+                    normalizer=normalizer, cache=cache))
+            else:
+                _, needs_browser = scrape_pdps_http(prod_ids, emit, max_workers=args.pdp_workers,
+                                                    limiter=limiter, tracker=tracker, normalizer=normalizer,
+                                                    cache=cache, pool=pool)
+            rate = len(needs_browser) / len(prod_ids) if prod_ids else 0.0
+            print(f"🌐 HTTP fetched {len(prod_ids) - len(needs_browser)}/{len(prod_ids)} PDPs; "
+                  f"browser fallback for {len(needs_browser)} ({rate:.1%})")
+        else:
+            needs_browser = list(prod_ids)
+
+        scrape_pdps_browser(needs_browser, emit, tabs=args.browser_tabs, limiter=limiter, tracker=tracker,
+                            normalizer=normalizer, cache=cache)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, args.metrics_host)
+        print(f"📈 Metrics at http://{args.metrics_host}:{args.metrics_port}/metrics")
+    snapshotter = MetricsSnapshotter(args.metrics_json) if args.metrics_json else None
+    cache = ResponseCache(args.cache, ttl=args.cache_ttl) if args.cache else None
+    if args.replay:
+        replay_run(args, cache)
+        cache.close()
+        report_metrics(snapshotter)
+        return
+    pool = None
+    if args.identities or args.proxies:
+        pool = SessionPool(load_identities(args.identities, args.proxies,
+                                           pool_size=max(MAX_WORKERS, args.pdp_workers) + 4, rate=args.rate))
+        print(f"🪪 {len(pool.identities)} identities in the session pool")
+    if args.role == "worker":
+        work_queue = WorkQueue(args.queue)
+        handled = run_worker(work_queue, args, RateLimiter(rate=args.rate), cache, pool)
+        print(f"👷 Worker {args.worker_id} finished: {handled} products reported to '{args.queue}'")
+        work_queue.close()
+        if cache:
+            cache.close()
+        report_pool(pool)
+        report_metrics(snapshotter)
+        return
+    # One request budget shared by the listing and PDP stages
+    limiter = RateLimiter(rate=args.rate)
+    if args.refresh:
+        refresh_run(args, limiter, cache, pool)
+        if cache:
+            cache.close()
+        report_pool(pool)
+        report_metrics(snapshotter)
+        return
+    work_queue = None
+    if args.role == "coordinator":
+        # A new run before listing, so workers started alongside us do not see the last run's seal and exit
+        work_queue = WorkQueue(args.queue)
+        work_queue.reset()
+    state = CrawlState(args.state)
+    if args.fresh:
+        state.reset()
+    elif state.get_meta("listing_done") and not state.pending(PDP_MAX_ATTEMPTS):
+        # Nothing left to resume: this is the next scheduled run
+        print(f"Previous crawl in {args.state} is complete; starting a new one")
+        state.reset()
+
+    if state.get_meta("listing_done"):
+        prod_ids = state.product_ids()
+        print(f"↩️ Listing already complete in {args.state}: {len(prod_ids)} prodIds")
+    else:
+        # Listing-level fields are kept as the baseline a later --refresh compares against
+        items: Dict[str, Dict[str, Any]] = {}
+        if args.engine == "async":
+            prod_ids = asyncio.run(collect_prod_ids_async(target_count=args.target, concurrency=args.concurrency,
+                                                          limiter=limiter, state=state, categories=args.categories,
+                                                          cache=cache, items=items))
+        else:
+            prod_ids = collect_prod_ids(target_count=args.target, limiter=limiter, state=state,
+                                        categories=args.categories, cache=cache, pool=pool, items=items)
+        state.save_listing_snapshots(items)
+        state.set_meta("listing_done", "1")
+        budget = "" if pool else f" (rate now {limiter.rate:.2f} req/s)"
+        print(f"✅ Collected {len(prod_ids)} prodIds from {len(args.categories)} categories{budget}")
+    # Kept as an artifact of the run; the PDP stage works from the checkpoint
+    with open(PRODUCT_IPS, "w", encoding="utf-8") as f:
+        json.dump(prod_ids, f, indent=2)
+    print(f"💾 Saved to {PRODUCT_IPS}")
+
+    listed_in = state.categories_of()
+
+    # Only PDPs not finished by an earlier run
+    done_before = state.counts().get("done", 0)
+    prod_ids = state.pending(PDP_MAX_ATTEMPTS)
+    if done_before:
+        print(f"↩️ Resuming: {done_before} PDPs already done, {len(prod_ids)} to go")
+
+    # Each build_output result is appended to the stream as soon as it exists;
+    # a product counts as done in the checkpoint once its line is flushed, and
+    # the checkpoint records how many lines that was. A resumed run cuts the
+    # stream back to it, since anything after it gets scraped again.
+    output = stream_path(args.output, args.compress)
+    mode = "a" if done_before else "w"
+    lines_before = 0
+    if mode == "a":
+        checkpointed = state.get_meta("stream_lines")
+        lines_before = trim_stream(output, int(checkpointed) if checkpointed else None)
+    tracker = ChangeTracker(state, mode=mode) if args.incremental else None
+    # Unchanged products get no new record, so an incremental crawl keeps the last
+    # full output aside and copies their records over from it
+    previous = None
+    if tracker:
+        previous = state.get_meta("carry_from")
+        if previous is None and mode == "w" and os.path.exists(output):
+            suffix = COMPRESSION_SUFFIXES[args.compress]
+            previous = output[:-len(suffix)] + ".previous" + suffix if suffix else output + ".previous"
+            os.replace(output, previous)
+            state.set_meta("carry_from", previous)
+
+    def on_flush(keys: List[str]) -> None:
+        state.mark_done(keys, stream_lines=lines_before + writer.count,
+                        parquet_parts=columnar.parts if columnar else None)
+        if tracker:
+            tracker.commit(keys)
+
+    # With --parquet the checkpoint follows the Parquet row groups, which flush less often than the stream.
+    # Both sinks are written under one lock, so at a row-group flush every stream line has its row in it.
+    columnar = None
+    emit_lock = threading.Lock()
+    if args.parquet:
+        def on_parquet_flush(keys: List[str]) -> None:
+            writer.flush()
+            on_flush(keys)
+        parts = state.get_meta("parquet_parts") if mode == "a" else None
+        columnar = ParquetSink(args.parquet, mode=mode, on_flush=on_parquet_flush,
+                               keep=int(parts) if parts else None)
+
+    with JsonlWriter(output, mode=mode, on_flush=None if columnar else on_flush) as writer:
+        def emit(prod_id: str, product: ProductRecord) -> None:
+            product.prodId = prod_id
+            product.listingCategories = listed_in.get(prod_id)
+            if columnar:
+                with emit_lock:
+                    writer.write(product)
+                    columnar.write(product, key=prod_id)
+            else:
+                writer.write(product, key=prod_id)
 
-    # Close the browser when done
-    page.quit()
+        try:
+            if work_queue:
+                # Workers fetch and normalize; their products arrive here through the queue
+                received = coordinate(work_queue, prod_ids, emit)
+                print(f"📬 Workers reported {received}/{len(prod_ids)} products ({work_queue.counts()})")
+                work_queue.close()
+            else:
+                scrape_here(args, prod_ids, emit, limiter, tracker, cache, pool)
+            if previous and os.path.exists(previous):
+                writer.flush()
+                carried = tracker.carry_forward(previous, output, emit)
+                print(f"📎 Carried {carried} unchanged products over from '{previous}'")
+        finally:
+            # Closing writes the last, partial batch as its own part
+            if columnar:
+                columnar.close()
+    state.mark_failed(prod_ids, "no product data")
+    if previous and os.path.exists(previous) and not state.pending(PDP_MAX_ATTEMPTS):
+        os.remove(previous)
+    print(f"{writer.count} products streamed to '{output}' ({state.counts()})")
+    if columnar:
+        print(f"🧱 Parquet: {columnar.count} products, {columnar.sku_count} SKUs -> '{args.parquet}'")
+    if tracker:
+        print(f"🔁 Changes since last run: {tracker.finish(state.product_ids())} -> '{CHANGE_FEED}'")
+    state.close()
+    if cache:
+        print(f"🗄️ Response cache '{args.cache}': {cache.counts()}")
+        cache.close()
+
+    if args.pretty_json:
+        count = rebuild_json_array(output, OUTPUT_PRODUCT_DATA)
+        print(f"All product data ({count}) saved to '{OUTPUT_PRODUCT_DATA}'")
+    if pool:
+        report_pool(pool)
+    else:
+        print(f"Request budget at end of run: {limiter.rate:.2f} req/s")
+    report_metrics(snapshotter)
     print("Processing complete.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark: build_output per product, optionally against an older revision.
+
+    python benchmarks/bench_build_output.py [--repeat 5] [--baseline HEAD~1]
+
+Reports build_output alone, build_output plus encoding to a JSONL line, and the
+memory retained per built product. With --baseline the scraper module at that
+git revision is loaded side by side, its output is checked to be identical and
+the speedups are reported.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from fixtures import fixtures_recorded, load_pdp_fixtures  # noqa: E402
+
+
+def load_revision(rev: str) -> ModuleType:
+    src = subprocess.run(["git", "show", f"{rev}:REI_Product_Data_Scraper.py"], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False, encoding="utf-8") as f:
+        f.write(src)
+    try:
+        spec = importlib.util.spec_from_file_location("rei_baseline", f.name)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+    finally:
+        os.unlink(f.name)
+    return mod
+
+
+def as_plain(product: Any) -> Dict[str, Any]:
+    """Typed records and the older plain-dict output compare the same way."""
+    return product.as_dict() if hasattr(product, "as_dict") else product
+
+
+def encoder(mod: ModuleType) -> Callable[[Dict[str, Any]], str]:
+    """build_output + one JSONL line, the way that revision's writer encodes it."""
+    if hasattr(mod, "ProductRecord"):
+        return lambda d: mod.build_output(d).to_json()
+    return lambda d: json.dumps(mod.build_output(d), separators=(",", ":"))
+
+
+def retained_bytes(build: Callable[[Dict[str, Any]], Any], docs: List[Dict[str, Any]]) -> float:
+    """Bytes allocated and still held per product while every built product is kept alive."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [build(d) for d in docs]
+    held = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return held / len(docs)
+
+
+def time_per_product(fn: Callable[[Dict[str, Any]], Dict[str, Any]], docs: List[Dict[str, Any]], repeat: int) -> float:
+    """Best-of-`repeat` seconds per product."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for d in docs:
+            fn(d)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(docs)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--baseline", help="git revision to compare against (e.g. HEAD~1)")
+    args = ap.parse_args()
+
+    docs = []
+    for name, html in load_pdp_fixtures():
+        text = rei.extract_model_data_json(html)
+        if text is None:
+            raise SystemExit(f"no modelData in fixture {name}")
+        docs.append(json.loads(text))
+    print(f"{len(docs)} modelData documents ({'saved' if fixtures_recorded() else 'synthetic'} PDPs)")
+
+    mods = [("current", rei)]
+    if args.baseline:
+        base = load_revision(args.baseline)
+        for d in docs:
+            if json.dumps(as_plain(base.build_output(d))) != json.dumps(as_plain(rei.build_output(d))):
+                raise SystemExit("output differs from baseline")
+        mods.append((args.baseline, base))
+
+    results = []
+    for label, mod in mods:
+        build_s = time_per_product(mod.build_output, docs, args.repeat)
+        encode_s = time_per_product(encoder(mod), docs, args.repeat)
+        kb = retained_bytes(mod.build_output, docs) / 1024
+        results.append((build_s, encode_s))
+        print(f"{label:<10}: build {build_s * 1e6:7.1f} us  build+encode {encode_s * 1e6:7.1f} us  "
+              f"retained {kb:6.1f} KB/product")
+    if len(results) == 2:
+        (cur_b, cur_e), (base_b, base_e) = results
+        print(f"speedup   : build {base_b / cur_b:.2f}x  build+encode {base_e / cur_e:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: thread-pool engine vs asyncio engine against the local mock server.
+
+    python benchmarks/bench_engines.py [--latency 0.05] [--products 600] [--workers 8] [--concurrency 200]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from mock_server import MockREI  # noqa: E402
+
+
+def unlimited() -> rei.RateLimiter:
+    # The benchmark measures the engines, not the politeness budget
+    return rei.RateLimiter(rate=1e6, max_rate=1e6, burst=10_000)
+
+
+def timed(label: str, count: int, fn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+    print(f"{label:<28} {count:>6} in {elapsed:6.2f}s  -> {count / elapsed:8.1f}/s")
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--latency", type=float, default=0.05, help="mock server latency per request (s)")
+    ap.add_argument("--products", type=int, default=600)
+    ap.add_argument("--per-page", type=int, default=10)
+    ap.add_argument("--workers", type=int, default=rei.MAX_WORKERS)
+    ap.add_argument("--concurrency", type=int, default=rei.ASYNC_CONCURRENCY)
+    args = ap.parse_args()
+
+    category = "womens-t-shirts"
+    pages = -(-args.products // args.per_page)
+    with MockREI({category: args.products}, per_page=args.per_page, latency=args.latency) as mock:
+        mock.point(rei)
+        print(f"mock latency {args.latency * 1000:.0f} ms; {pages} listing pages, {args.products} PDPs")
+
+        ids = timed(f"listing threads ({args.workers})", pages, lambda: rei.collect_prod_ids(
+            target_count=0, max_workers=args.workers, limiter=unlimited(), categories=[category]))
+        ids_async = timed(f"listing async ({args.concurrency})", pages, lambda: asyncio.run(rei.collect_prod_ids_async(
+            target_count=0, concurrency=args.concurrency, limiter=unlimited(), categories=[category])))
+        assert sorted(ids) == sorted(ids_async), "engines disagree on prodIds"
+
+        def sink(prod_id, product):
+            pass
+
+        timed(f"PDP threads ({args.workers})", len(ids), lambda: rei.scrape_pdps_http(
+            ids, sink, max_workers=args.workers, limiter=unlimited()))
+        timed(f"PDP async ({args.concurrency})", len(ids), lambda: asyncio.run(rei.scrape_pdps_async(
+            ids, sink, concurrency=args.concurrency, limiter=unlimited())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark: modelData extraction, raw-HTML scan vs full BeautifulSoup parse.
+
+    python benchmarks/bench_extract.py [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from fixtures import fixtures_recorded, load_pdp_fixtures  # noqa: E402
+
+
+def time_per_page(fn: Callable[[str], Optional[str]], pages: List[Tuple[str, str]], repeat: int) -> float:
+    """Best-of-`repeat` seconds per page."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(pages)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    pages = load_pdp_fixtures()
+    avg_kb = sum(len(h) for _, h in pages) / len(pages) / 1024
+    corpus = "saved" if fixtures_recorded() else "synthetic"
+    print(f"{len(pages)} {corpus} PDP fixtures, avg {avg_kb:.0f} KB")
+
+    # Same JSON text from both paths, otherwise the numbers mean nothing
+    for name, html in pages:
+        if rei.extract_model_data_json(html) != rei.find_model_data_soup(html):
+            raise SystemExit(f"mismatch on fixture {name}")
+
+    soup_s = time_per_page(rei.find_model_data_soup, pages, args.repeat)
+    fast_s = time_per_page(rei.extract_model_data_json, pages, args.repeat)
+    print(f"BeautifulSoup : {soup_s * 1000:8.2f} ms/page")
+    print(f"raw scan      : {fast_s * 1000:8.2f} ms/page")
+    print(f"speedup       : {soup_s / fast_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
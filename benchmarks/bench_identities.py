@@ -0,0 +1,65 @@
+"""Benchmark: one client identity vs a SessionPool against a mock that throttles each identity.
+
+    python benchmarks/bench_identities.py [--identities 4] [--identity-rate 5] [--products 120] [--blocked 1]
+
+The mock answers 429 once a User-Agent exceeds --identity-rate requests/s and
+403 to the --blocked identities. Each run scrapes the same PDPs and reports
+throughput, the 403/429 answers received and how the pool spread and benched
+its identities.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from mock_server import MockREI  # noqa: E402
+
+
+def identities(count: int, rate: float) -> List[rei.Identity]:
+    return [rei.Identity(f"id{i}", {"user-agent": f"bench-agent-{i}"}, rate=rate) for i in range(count)]
+
+
+def run(label: str, pool: rei.SessionPool, mock: MockREI, ids: List[str], workers: int) -> None:
+    before = dict(mock.hits)
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        handled, _ = rei.scrape_pdps_http(ids, lambda pid, product: None, max_workers=workers, pool=pool)
+        elapsed = time.perf_counter() - t0
+    print(f"{label:<18} {handled:>5} PDPs in {elapsed:6.2f}s -> {handled / elapsed:6.1f}/s  "
+          f"429s {mock.hits['throttled'] - before['throttled']:>4}  403s {mock.hits['blocked'] - before['blocked']:>4}")
+    for row in pool.snapshot():
+        print(f"    {row['identity']:<6} health {row['health']:.2f}  requests {row['requests']:>4}  "
+              f"rate {row['rate']:5.2f}/s  benched {row['times_benched']}x")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--identities", type=int, default=4)
+    ap.add_argument("--identity-rate", type=float, default=5.0, help="requests/s the mock allows each identity")
+    ap.add_argument("--blocked", type=int, default=1, help="identities the mock answers with 403")
+    ap.add_argument("--products", type=int, default=120)
+    ap.add_argument("--workers", type=int, default=rei.PDP_WORKERS)
+    ap.add_argument("--bench-seconds", type=float, default=2.0, help="first bench of a blocked identity (s)")
+    args = ap.parse_args()
+
+    category = "womens-t-shirts"
+    ids = [str(1000 + i) for i in range(args.products)]
+    blocked = [f"bench-agent-{i}" for i in range(args.identities - args.blocked, args.identities)]
+    with MockREI({category: args.products}, identity_rate=args.identity_rate, blocked_agents=blocked) as mock:
+        mock.point(rei)
+        # Every identity starts at the rate the site tolerates, so the comparison is about spreading the load
+        for count in (1, args.identities):
+            pool = rei.SessionPool(identities(count, args.identity_rate), bench_seconds=args.bench_seconds)
+            run("single identity" if count == 1 else f"pool of {count}", pool, mock, ids, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Fixture corpus for the offline benchmarks.
+
+Saved PDP pages go in ``benchmarks/fixtures/pdp/`` as ``<prodId>.html`` (or
+``.html.gz``) and saved listing responses in ``benchmarks/fixtures/listing/`` as
+``<slug>/<page>.json`` (or ``.json.gz``); ``record_fixtures.py`` fills both from
+the live site.  When a folder is empty a deterministic synthetic corpus with the
+same shape as a real REI page (large head, deep body, modelData near the end) is
+generated instead, so the benchmarks always have something to chew on.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PDP_DIR = FIXTURES_DIR / "pdp"
+LISTING_DIR = FIXTURES_DIR / "listing"
+
+COLORS = ["BLACK", "Navy Heather", "Sage", "Cloud White", "Burnt Orange", "Dusty Rose"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+
+# ========== Synthetic PDPs ==========
+def make_model_data(prod_id: str, n_skus: int = 36, seed: int = 0) -> Dict[str, Any]:
+    rnd = random.Random(f"{prod_id}:{seed}")
+    skus = []
+    for i in range(n_skus):
+        regular = rnd.choice([29.95, 34.95, 39.95, 49.95])
+        on_sale = rnd.random() < 0.4
+        price = round(regular * rnd.uniform(0.5, 0.8), 2) if on_sale else regular
+        skus.append({
+            "skuId": f"{prod_id}{i:04d}",
+            "color": {"code": f"C{i % len(COLORS)}", "displayLabel": COLORS[i % len(COLORS)]},
+            "size": {"code": SIZES[i % len(SIZES)], "name": SIZES[i % len(SIZES)]},
+            "price": {
+                "price": {"value": price, "sale": on_sale, "offerType": "sale" if on_sale else "regular"},
+                "compareAt": {"value": regular} if on_sale else None,
+                "savingsPercentage": round(100 * (1 - price / regular)) if on_sale else None,
+            },
+            "sellable": rnd.random() < 0.85,
+            "unavailable": rnd.random() < 0.2,
+            "status": "AVAILABLE",
+            "images": [{"uri": f"/media/{prod_id}/{i}_{k}.jpg", "width": 1000} for k in range(3)],
+        })
+    product = {
+        "styleId": prod_id,
+        "title": f"Trail Tee {prod_id}",
+        "brand": {"name": "REI Co-op", "link": "/b/rei-co-op", "logoUrl": "media/brand/rei.png"},
+        "canonicalUrl": f"/product/{prod_id}/trail-tee",
+        "breadcrumbs": [
+            {"item": {"name": name, "url": f"/c/{slug}", "canonical": True}}
+            for name, slug in (("Women", "women"), ("Women's Clothing", "womens-clothing"), ("Women's T-Shirts", "womens-t-shirts"))
+        ],
+        "taxCat": "T-Shirts", "taxCatRoot": "Clothing",
+        "colors": [{"displayLabel": c, "code": f"C{i}"} for i, c in enumerate(COLORS)],
+        "sizesV2": SIZES,
+        "skus": skus,
+        "features": [f"Feature bullet number {i} with a little marketing copy attached." for i in range(8)],
+        "specs": [{"name": f"Spec {i}", "value": f"Value {i}"} for i in range(12)],
+        "reviews": {"reviewSummary": {
+            "averageRating": round(rnd.uniform(3.5, 5), 1), "count": rnd.randint(0, 900),
+            "ratingHistogram": {str(k): rnd.randint(0, 200) for k in range(1, 6)}, "topRated": rnd.random() < 0.2,
+        }},
+        "displayOptions": {"featuredImage": {"heroImageUrl": f"/media/{prod_id}/hero.jpg"}},
+        "images": [{"uri": f"/media/{prod_id}/{k}.jpg"} for k in range(10)],
+        "videos": [],
+        "sapGender": "Womens", "eligibleForShipping": True, "allSkusAreBopusOnly": False,
+        "anyOversizeCharges": False, "anySkuShippingRestrictions": False, "anySkusAreMembersOnly": False,
+        "allDisplayableSkusArePreorder": False, "allDisplayableSkusAreBackorder": False,
+    }
+    return {
+        "title": f"REI Co-op Trail Tee {prod_id} | REI Co-op",
+        "description": "A soft, breathable tee for trail days and town days.",
+        "openGraphProperties": {"og:url": f"https://www.rei.com/product/{prod_id}/trail-tee"},
+        "pageData": {"product": product},
+    }
+
+
+def make_pdp_html(model_data: Dict[str, Any], filler_blocks: int = 400) -> str:
+    head = "\n".join(
+        f'<link rel="preload" href="/assets/chunk-{i}.js" as="script"><script src="/assets/chunk-{i}.js" defer></script>'
+        for i in range(60)
+    )
+    inline_state = json.dumps({"analytics": {f"k{i}": "x" * 40 for i in range(200)}})
+    body = "\n".join(
+        f'<div class="pdp-row r{i}"><section data-ui="block-{i}"><h3>Heading {i}</h3>'
+        f'<p class="copy">Lorem ipsum <a href="/c/item-{i}">link {i}</a> dolor <span>sit</span> amet.</p>'
+        f'<ul><li>One</li><li>Two</li><li>Three</li></ul><img src="/media/{i}.jpg" alt="img {i}"></section></div>'
+        for i in range(filler_blocks)
+    )
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\"><title>PDP</title>\n"
+        f"{head}\n<script>window.__STATE__ = {inline_state};</script>\n"
+        "<style>.pdp-row{display:flex}</style></head><body>\n"
+        f"<main id=\"app\">{body}</main>\n"
+        f"<script type=\"application/json\" id=\"modelData\">{json.dumps(model_data)}</script>\n"
+        "<script>window.dataLayer = window.dataLayer || [];</script></body></html>"
+    )
+
+
+def synthetic_pdps(count: int = 8) -> List[Tuple[str, str]]:
+    out = []
+    for i in range(count):
+        prod_id = str(200000 + i)
+        out.append((prod_id, make_pdp_html(make_model_data(prod_id, n_skus=24 + 6 * i))))
+    return out
+
+
+# ========== Saved Corpus ==========
+def read_text(path: Path) -> str:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    return path.read_text(encoding="utf-8")
+
+
+def load_pdp_fixtures() -> List[Tuple[str, str]]:
+    """Return (name, html) pairs: saved PDPs if present, else the synthetic set."""
+    files = sorted(PDP_DIR.glob("*.html")) + sorted(PDP_DIR.glob("*.html.gz"))
+    if files:
+        return [(p.name.split(".")[0], read_text(p)) for p in files]
+    return synthetic_pdps()
+
+
+def fixtures_recorded() -> bool:
+    """True when record_fixtures.py has saved real PDPs; the repository ships none."""
+    return bool(saved_pdps())
+
+
+def saved_pdps() -> Dict[str, Path]:
+    """prodId -> saved PDP file, for the mock server."""
+    return {p.name.split(".")[0]: p for p in sorted(PDP_DIR.glob("*.html*"))}
+
+
+def saved_listings() -> Dict[Tuple[str, int], Path]:
+    """(slug, page) -> saved listing response, for the mock server."""
+    out = {}
+    for p in sorted(LISTING_DIR.glob("*/*.json*")):
+        page = p.name.split(".")[0]
+        if page.isdigit():
+            out[(p.parent.name, int(page))] = p
+    return out
+
+
+def load_listing_fixtures(category: str = "womens-t-shirts", count: int = 300) -> List[Tuple[str, str]]:
+    """Return (name, json text) listing pages: saved ones if present, else a synthetic category."""
+    saved = saved_listings()
+    if saved:
+        return [(f"{slug}/{page}", read_text(p)) for (slug, page), p in sorted(saved.items())]
+    pages = -(-count // 30)
+    return [(f"{category}/{page}", json.dumps(make_listing_payload(category, page, count)))
+            for page in range(1, pages + 1)]
+
+
+# ========== Synthetic Listings ==========
+def listing_ids(category: str, count: int) -> List[str]:
+    """Stable prodIds for a synthetic category of `count` products."""
+    base = 100000 + (sum(map(ord, category)) % 900) * 1000
+    return [str(base + i) for i in range(count)]
+
+
+def listing_item(prod_id: str) -> Dict[str, Any]:
+    """One searchResults item, with the price/rating/availability fields a real listing carries."""
+    rnd = random.Random(f"listing:{prod_id}")
+    regular = rnd.choice([29.95, 34.95, 39.95, 49.95])
+    on_sale = rnd.random() < 0.4
+    low = round(regular * rnd.uniform(0.5, 0.8), 2) if on_sale else regular
+    return {
+        "prodId": prod_id, "cleanTitle": f"Trail Tee {prod_id}", "brand": "REI Co-op", "link": f"/product/{prod_id}",
+        "displayPrice": {"min": low, "max": regular if not on_sale else round(regular * 0.8, 2),
+                         "compareAt": regular if on_sale else None},
+        "sale": on_sale, "percentageOff": round((1 - low / regular) * 100) if on_sale else None,
+        "rating": round(rnd.uniform(3.0, 5.0), 1), "reviewCount": rnd.randint(0, 500), "available": rnd.random() < 0.95,
+    }
+
+
+def make_listing_payload(category: str, page: int, count: int, per_page: int = 30,
+                         with_totals: bool = True) -> Dict[str, Any]:
+    ids = listing_ids(category, count)[(page - 1) * per_page: page * per_page]
+    results = [listing_item(pid) for pid in ids]
+    search = {"results": results}
+    if with_totals:
+        search.update({"total": count, "pageSize": per_page})
+    return {"searchResults": search}
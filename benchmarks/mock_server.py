@@ -0,0 +1,161 @@
+"""A local stand-in for rei.com that serves listing JSON and PDP HTML from the fixtures.
+
+    with MockREI({"womens-t-shirts": 300}, latency=0.05, throttle=0.05) as mock:
+        mock.point(rei)          # aim LISTING_URL_TMPL / PDP_URL_TMPL at it
+        rei.collect_prod_ids(target_count=0)
+
+Recorded pages (see fixtures.py) are served when they exist for the requested
+category page or prodId; everything else is synthesized.  `throttle` is the
+share of requests answered with 429 (plus Retry-After when `retry_after` is set).
+`identity_rate` throttles each client identity (User-Agent) separately: past
+that many requests per second an identity gets 429s, and user agents in
+`blocked_agents` always get 403.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from fixtures import make_listing_payload, make_model_data, make_pdp_html, read_text, saved_listings, saved_pdps
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class MockREI:
+    def __init__(self, categories: Dict[str, int], per_page: int = 30, latency: float = 0.0,
+                 with_totals: bool = True, pdp_filler: int = 40, throttle: float = 0.0,
+                 retry_after: Optional[float] = None, seed: int = 0, recorded: bool = True,
+                 identity_rate: Optional[float] = None, blocked_agents: Iterable[str] = ()):
+        self.categories = categories
+        self.per_page = per_page
+        self.latency = latency
+        self.with_totals = with_totals
+        self.pdp_filler = pdp_filler
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.identity_rate = identity_rate
+        self.blocked_agents = set(blocked_agents)
+        self.hits = {"listing": 0, "pdp": 0, "throttled": 0, "blocked": 0}
+        self.by_identity: Dict[str, Dict[str, int]] = {}
+        self._buckets: Dict[str, list] = {}   # user agent -> [tokens, last refill]
+        self._saved_pdps = saved_pdps() if recorded else {}
+        self._saved_listings = saved_listings() if recorded else {}
+        self._pdp_cache: Dict[str, bytes] = {}
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+
+    # --- lifecycle ---
+    def __enter__(self) -> "MockREI":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, ctype = mock.respond(self.path, self.headers.get("User-Agent", ""))
+                self.send_response(status)
+                if status == 429 and mock.retry_after is not None:
+                    self.send_header("Retry-After", f"{mock.retry_after:g}")
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def point(self, rei) -> None:
+        rei.LISTING_URL_TMPL = self.base_url + "/c/{}?json=true&page={}"
+        rei.PDP_URL_TMPL = self.base_url + "/product/{}"
+
+    # --- routing ---
+    def admit(self, agent: str) -> int:
+        """Per-identity gate: 403 for blocked agents, 429 past `identity_rate`, else 200."""
+        with self._lock:
+            counts = self.by_identity.setdefault(agent, {"ok": 0, "429": 0, "403": 0})
+            if agent in self.blocked_agents:
+                status = 403
+            elif self.identity_rate:
+                now = time.monotonic()
+                # One second's worth of burst, like a typical per-client limiter
+                burst = max(1.0, self.identity_rate)
+                tokens, last = self._buckets.get(agent, [burst, now])
+                tokens = min(burst, tokens + (now - last) * self.identity_rate)
+                status = 200 if tokens >= 1 else 429
+                self._buckets[agent] = [tokens - (status == 200), now]
+            else:
+                status = 200
+            counts["ok" if status == 200 else str(status)] += 1
+            self.hits["throttled"] += status == 429
+            self.hits["blocked"] += status == 403
+        return status
+
+    def respond(self, path: str, agent: str = ""):
+        if self.latency:
+            time.sleep(self.latency)
+        status = self.admit(agent)
+        if status == 403:
+            return 403, b"Forbidden", "text/plain"
+        if status == 429:
+            return 429, b"Too Many Requests", "text/plain"
+        if self.throttle:
+            with self._lock:
+                throttled = self._rnd.random() < self.throttle
+                self.hits["throttled"] += throttled
+            if throttled:
+                return 429, b"Too Many Requests", "text/plain"
+        url = urlparse(path)
+        if url.path.startswith("/c/"):
+            with self._lock:
+                self.hits["listing"] += 1
+            slug = url.path[len("/c/"):]
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            saved = self._saved_listings.get((slug, page))
+            if saved is not None:
+                return 200, read_text(saved).encode(), "application/json"
+            payload = make_listing_payload(slug, page, self.categories.get(slug, 0), self.per_page, self.with_totals)
+            return 200, json.dumps(payload).encode(), "application/json"
+        if url.path.startswith("/product/"):
+            with self._lock:
+                self.hits["pdp"] += 1
+            return 200, self.pdp_bytes(url.path.rsplit("/", 1)[-1]), "text/html; charset=utf-8"
+        return 404, b"not found", "text/plain"
+
+    def pdp_bytes(self, prod_id: str) -> bytes:
+        body = self._pdp_cache.get(prod_id)
+        if body is None:
+            saved = self._saved_pdps.get(prod_id)
+            html = read_text(saved) if saved is not None else make_pdp_html(make_model_data(prod_id),
+                                                                           filler_blocks=self.pdp_filler)
+            body = html.encode()
+            self._pdp_cache[prod_id] = body
+        return body
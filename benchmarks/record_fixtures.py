@@ -0,0 +1,66 @@
+"""Record a benchmark corpus from the live site into benchmarks/fixtures/.
+
+    python benchmarks/record_fixtures.py [--category womens-t-shirts] [--pages 3] [--pdps 20] [--rate 1]
+
+Listing responses are saved as listing/<slug>/<page>.json.gz and PDP pages as
+pdp/<prodId>.html.gz.  PDPs without server-rendered modelData are skipped, since
+the offline benchmarks cannot render them.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from fixtures import LISTING_DIR, PDP_DIR  # noqa: E402
+
+
+def save(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(text)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--category", default=rei.CATEGORIES[0])
+    ap.add_argument("--pages", type=int, default=3, help="listing pages to record")
+    ap.add_argument("--pdps", type=int, default=20, help="PDPs to record")
+    ap.add_argument("--rate", type=float, default=1.0, help="requests per second")
+    args = ap.parse_args()
+
+    limiter = rei.RateLimiter(rate=args.rate, max_rate=args.rate)
+    session = rei.make_session(2, limiter)
+    prod_ids = []
+    for page in range(1, args.pages + 1):
+        r = rei.limited_get(session, rei.listing_url(args.category, page), limiter)
+        if r.status_code != 200:
+            print(f"listing page {page}: HTTP {r.status_code}, stopping")
+            break
+        save(LISTING_DIR / args.category / f"{page}.json.gz", r.text)
+        ids = rei.parse_prod_ids(r.json())
+        print(f"listing page {page}: {len(ids)} prodIds")
+        if not ids:
+            break
+        prod_ids.extend(i for i in ids if i not in prod_ids)
+
+    saved = 0
+    for prod_id in prod_ids:
+        if saved >= args.pdps:
+            break
+        r = rei.limited_get(session, rei.PDP_URL_TMPL.format(prod_id), limiter)
+        if r.status_code != 200 or rei.extract_model_data_json(r.text) is None:
+            print(f"PDP {prod_id}: skipped (HTTP {r.status_code}, no modelData)")
+            continue
+        save(PDP_DIR / f"{prod_id}.html.gz", r.text)
+        saved += 1
+    print(f"recorded {saved} PDPs and listing pages for '{args.category}' under {PDP_DIR.parent}")
+
+
+if __name__ == "__main__":
+    main()
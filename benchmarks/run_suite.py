@@ -0,0 +1,195 @@
+"""Offline benchmark suite: every pipeline stage on the fixture corpus and the mock server.
+
+    python benchmarks/run_suite.py [--latency 0.02] [--throttle 0.02] [--products 300]
+                                   [--json results.json] [--compare baseline.json --tolerance 0.15]
+
+Micro stages (parse_prod_ids, parse_listing_items, modelData extraction, build_output, normalize+encode)
+run on the recorded corpus, or the synthetic one when nothing is recorded.
+End-to-end stages run collect_prod_ids and the HTTP PDP scrape (through the
+normalizer into a JSONL stream) against MockREI with the given latency and 429
+share. Each stage reports throughput and peak traced memory; --compare exits
+non-zero when a stage got slower than the baseline by more than --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+from fixtures import fixtures_recorded, load_listing_fixtures, load_pdp_fixtures, saved_listings  # noqa: E402
+from mock_server import MockREI  # noqa: E402
+
+Result = Dict[str, Any]
+
+
+def unlimited() -> rei.RateLimiter:
+    # The suite measures the pipeline, not the politeness budget
+    return rei.RateLimiter(rate=1e6, max_rate=1e6, burst=10_000)
+
+
+def peak_kb(fn: Callable[[], Any]) -> float:
+    """Peak traced allocation while `fn` runs once."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def micro(name: str, unit: str, items: List[Any], fn: Callable[[Any], Any], repeat: int) -> Result:
+    """Best-of-`repeat` pass over `items`, plus the peak memory of one pass."""
+    def one_pass():
+        for item in items:
+            fn(item)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        one_pass()
+        best = min(best, time.perf_counter() - t0)
+    return {"stage": name, "count": len(items), "seconds": best, "rate": len(items) / best, "unit": unit,
+            "peak_kb": peak_kb(one_pass)}
+
+
+def end_to_end(name: str, unit: str, fn: Callable[[], int]) -> Result:
+    """Time one run of `fn` (which returns how many units it processed), then trace a second for memory.
+
+    tracemalloc slows threaded code down noticeably, so the two are kept apart.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        count = fn()
+        elapsed = time.perf_counter() - t0
+        peak = peak_kb(fn)
+    return {"stage": name, "count": count, "seconds": elapsed, "rate": count / elapsed, "unit": unit,
+            "peak_kb": peak}
+
+
+def scrape_into_stream(prod_ids: List[str], processes: int, run) -> int:
+    """Run one PDP engine through the normalizer into a throwaway JSONL stream; products written."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with rei.JsonlWriter(os.path.join(tmp, "bench.jsonl")) as writer:
+            def emit(prod_id, product):
+                writer.write(product, key=prod_id)
+            with rei.make_normalizer(emit, processes=processes) as normalizer:
+                run(emit, normalizer)
+        return writer.count
+
+
+def run_suite(args: argparse.Namespace) -> List[Result]:
+    results = []
+    listings = [text for _, text in load_listing_fixtures()]
+    pages = [html for _, html in load_pdp_fixtures()]
+    texts = [rei.extract_model_data_json(html) for html in pages]
+    docs = [json.loads(t) for t in texts if t]
+    print(f"Corpus: {'saved' if fixtures_recorded() else 'synthetic'} PDPs, "
+          f"{'saved' if saved_listings() else 'synthetic'} listings")
+
+    results.append(micro("parse_prod_ids", "pages/s", listings,
+                         lambda t: rei.parse_prod_ids(rei.loads_json(t)), args.repeat))
+    results.append(micro("parse_listing_items", "pages/s", listings,
+                         lambda t: rei.parse_listing_items(rei.loads_json(t)), args.repeat))
+    results.append(micro("extract_model_data", "pages/s", pages, rei.extract_model_data_json, args.repeat))
+    results.append(micro("build_output", "products/s", docs, rei.build_output, args.repeat))
+    results.append(micro("normalize+encode", "products/s", [t for t in texts if t],
+                         lambda t: rei.dumps_json(rei.normalize_model_data(t)[1].as_dict()), args.repeat))
+
+    # A recorded category is crawled as recorded; otherwise the mock synthesizes one of --products
+    recorded = sorted({slug for slug, _ in saved_listings()})
+    category = recorded[0] if recorded else "womens-t-shirts"
+    with MockREI({category: 0 if recorded else args.products}, per_page=args.per_page, latency=args.latency,
+                 throttle=args.throttle, retry_after=args.retry_after) as mock:
+        mock.point(rei)
+        ids: List[str] = []
+
+        def listing(run: Callable[[], List[str]]) -> Callable[[], int]:
+            def fn() -> int:
+                before = mock.hits["listing"]
+                ids[:] = run()
+                return mock.hits["listing"] - before
+            return fn
+
+        def pdps(run: Callable[[Any, Any], Any]) -> Callable[[], int]:
+            return lambda: scrape_into_stream(ids, args.normalize_processes, run)
+
+        results.append(end_to_end("listing threads", "pages/s", listing(lambda: rei.collect_prod_ids(
+            target_count=0, max_workers=args.workers, limiter=unlimited(), categories=[category]))))
+        # Render every PDP once up front so the mock's own page generation is not measured
+        for prod_id in ids:
+            mock.pdp_bytes(prod_id)
+        results.append(end_to_end("PDP threads", "products/s", pdps(lambda emit, n: rei.scrape_pdps_http(
+            ids, emit, max_workers=args.workers, limiter=unlimited(), normalizer=n))))
+        if rei.aiohttp is not None:
+            results.append(end_to_end("listing async", "pages/s", listing(lambda: asyncio.run(
+                rei.collect_prod_ids_async(target_count=0, concurrency=args.concurrency, limiter=unlimited(),
+                                           categories=[category])))))
+            results.append(end_to_end("PDP async", "products/s", pdps(lambda emit, n: asyncio.run(
+                rei.scrape_pdps_async(ids, emit, concurrency=args.concurrency, limiter=unlimited(), normalizer=n)))))
+    print(f"mock: {len(ids)} prodIds, latency {args.latency * 1000:.0f} ms; {mock.hits['listing']} listing and "
+          f"{mock.hits['pdp']} PDP requests served, {mock.hits['throttled']} answered 429")
+    return results
+
+
+def report(results: List[Result]) -> None:
+    for r in results:
+        print(f"{r['stage']:<20} {r['count']:>6} in {r['seconds']:7.3f}s  {r['rate']:10.1f} {r['unit']:<11} "
+              f"peak {r['peak_kb'] / 1024:7.1f} MB")
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+def compare(results: List[Result], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["stage"]: r for r in json.load(f)["results"]}
+    slower = []
+    for r in results:
+        base = baseline.get(r["stage"])
+        if base and r["rate"] < base["rate"] * (1 - tolerance):
+            slower.append(f"{r['stage']}: {r['rate']:.1f} vs {base['rate']:.1f} {r['unit']} "
+                          f"({r['rate'] / base['rate'] - 1:+.0%})")
+    return slower
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5, help="passes per micro stage (best is kept)")
+    ap.add_argument("--products", type=int, default=300, help="products in the mock category")
+    ap.add_argument("--per-page", type=int, default=30)
+    ap.add_argument("--latency", type=float, default=0.02, help="mock server latency per request (s)")
+    ap.add_argument("--throttle", type=float, default=0.0, help="share of mock requests answered with 429")
+    ap.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected 429s")
+    ap.add_argument("--workers", type=int, default=rei.MAX_WORKERS)
+    ap.add_argument("--concurrency", type=int, default=rei.ASYNC_CONCURRENCY)
+    ap.add_argument("--normalize-processes", type=int, default=0, help="0 = inline, as in a small run")
+    ap.add_argument("--json", metavar="PATH", help="write the results here (use as a later --compare baseline)")
+    ap.add_argument("--compare", metavar="PATH", help="baseline results from an earlier --json run")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before failing --compare")
+    args = ap.parse_args()
+
+    results = run_suite(args)
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        slower = compare(results, args.compare, args.tolerance)
+        for line in slower:
+            print(f"REGRESSION {line}")
+        if slower:
+            raise SystemExit(1)
+        print(f"no stage slower than baseline by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Checkpoint/resume: CrawlState PDP status and the output stream cut back to the checkpoint."""
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+@pytest.fixture
+def state(tmp_path):
+    crawl_state = rei.CrawlState(str(tmp_path / "state.sqlite3"))
+    yield crawl_state
+    crawl_state.close()
+
+
+def test_pending_skips_done_and_exhausted(state):
+    state.add_products(["1", "2", "3"])
+    state.mark_done(["1"])
+    state.mark_failed(["1", "2", "3"], "no product data")
+    assert state.pending(max_attempts=2) == ["2", "3"]
+    state.mark_failed(["2"], "no product data")
+    assert state.pending(max_attempts=2) == ["3"]
+    assert state.counts() == {"done": 1, "failed": 2}
+
+
+def test_checkpoint_survives_a_reopen(state):
+    state.add_products(["1", "2"])
+    state.mark_done(["1"], stream_lines=1, parquet_parts=0)
+    reopened = rei.CrawlState(state.path)
+    assert reopened.pending() == ["2"]
+    assert reopened.get_meta("stream_lines") == "1"
+    assert reopened.get_meta("parquet_parts") == "0"
+    reopened.close()
+
+
+def test_reset_starts_a_new_crawl(state):
+    state.record_page("https://rei.test/a?page=1", "a", ["1"], ["1"])
+    state.set_meta("listing_done", "1")
+    state.reset()
+    assert state.product_ids() == [] and state.fetched_pages() == set()
+    assert state.get_meta("listing_done") is None
+
+
+def test_writer_reports_keys_only_once_flushed(tmp_path):
+    flushed = []
+    with rei.JsonlWriter(str(tmp_path / "out.jsonl"), flush_every=2, on_flush=flushed.append) as writer:
+        writer.write({"n": 1}, key="1")
+        assert flushed == []
+        writer.write({"n": 2}, key="2")
+        writer.write({"n": 3}, key="3")
+    assert flushed == [["1", "2"], ["3"]]
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_trim_cuts_back_to_the_checkpoint(tmp_path, suffix):
+    path = str(tmp_path / f"out.jsonl{suffix}")
+    with rei.JsonlWriter(path) as writer:
+        for n in range(5):
+            writer.write({"n": n})
+    assert rei.trim_stream(path, keep=3) == 3
+    assert [rec["n"] for rec in rei.iter_jsonl(path)] == [0, 1, 2]
+
+
+def test_trim_drops_a_torn_last_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"n":0}\n{"n":1}\n{"n":')
+    assert rei.trim_stream(str(path)) == 2
+    assert path.read_text() == '{"n":0}\n{"n":1}\n'
+
+
+def test_reader_skips_bad_lines_and_a_truncated_gzip_tail(tmp_path):
+    path = tmp_path / "out.jsonl.gz"
+    data = gzip.compress(b'{"n":0}\nnot json\n\n{"n":1}\n{"n":2}\n')
+    path.write_bytes(data[:-12])
+    assert [rec["n"] for rec in rei.iter_jsonl(str(path))][:2] == [0, 1]
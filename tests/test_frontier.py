@@ -0,0 +1,90 @@
+"""Multi-category listing crawl: fair scheduling, per-category end detection, dedup and resume from CrawlState."""
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+# category -> listing pages (1-based); crawl(planned=True) has the probe announce the page count
+CATALOG = {"a": [["1", "2"], ["3", "4"], ["5"]], "b": [["2", "6"], ["7"]]}
+
+
+def finished(ids, page_count=None, error=None) -> Future:
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result((ids, page_count))
+    return future
+
+
+def crawl(collector, planned=False, fail=()):
+    """Drive a ListingCollector against CATALOG one page at a time; return the pages fetched in order."""
+    fetched = []
+    while True:
+        task = collector.next_page()
+        if task is None:
+            break
+        category, page = task
+        fetched.append(task)
+        pages = CATALOG[category]
+        ids = pages[page - 1] if page <= len(pages) else []
+        future = finished(ids, len(pages) if planned else None, IOError("boom") if task in fail else None)
+        collector.result(category, page, future)
+    return fetched
+
+
+@pytest.fixture
+def state(tmp_path):
+    crawl_state = rei.CrawlState(str(tmp_path / "state.sqlite3"))
+    yield crawl_state
+    crawl_state.close()
+
+
+def test_dedup_across_categories_keeps_every_category(state):
+    collector = rei.ListingCollector(["a", "b"], 1, 2, state, 0)
+    crawl(collector)
+    # discovery order follows the round-robin: a1, b1, a2, b2, a3
+    assert collector.finish() == ["1", "2", "6", "3", "4", "7", "5"]
+    assert state.categories_of()["2"] == ["a", "b"]
+    assert state.product_ids() == collector.collected
+
+
+def test_categories_are_interleaved_and_end_on_their_own():
+    collector = rei.ListingCollector(["a", "b"], 1, 2, None, 0)
+    fetched = crawl(collector)
+    assert fetched[:4] == [("a", 1), ("b", 1), ("a", 2), ("b", 2)]
+    # two empty pages past the end of each category, no more
+    assert sorted(fetched) == [("a", p) for p in range(1, 6)] + [("b", p) for p in range(1, 5)]
+
+
+def test_planned_categories_stop_at_the_page_count():
+    collector = rei.ListingCollector(["a", "b"], 1, 2, None, 0)
+    fetched = crawl(collector, planned=True)
+    assert sorted(fetched) == [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("b", 2)]
+    assert collector.frontier.planned == 2
+
+
+def test_target_caps_collection():
+    collector = rei.ListingCollector(["a", "b"], 1, 2, None, 3)
+    crawl(collector)
+    assert collector.finish() == ["1", "2", "6"]
+
+
+def test_resume_skips_fetched_pages_and_keeps_ids(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first = rei.CrawlState(path)
+    crawl(rei.ListingCollector(["a", "b"], 1, 2, first, 0), fail={("a", 3)})
+    first.close()
+
+    state = rei.CrawlState(path)
+    collector = rei.ListingCollector(["a", "b"], 1, 2, state, 0)
+    assert collector.collected == ["1", "2", "6", "3", "4", "7"]
+    fetched = crawl(collector)
+    assert ("a", 3) in fetched and ("a", 1) not in fetched and ("b", 1) not in fetched
+    assert collector.finish() == ["1", "2", "6", "3", "4", "7", "5"]
+    state.close()
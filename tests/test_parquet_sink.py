@@ -0,0 +1,51 @@
+"""ParquetSink: SKU rows carry prodId, and a resumed sink drops parts a crash left behind."""
+import os
+import sys
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+def product(prod_id: str) -> rei.ProductRecord:
+    record = rei.ProductRecord.from_dict({"productId": f"style-{prod_id}", "productName": "Tee",
+                                          "skus": [{"skuId": f"{prod_id}-1"}, {"skuId": f"{prod_id}-2"}]})
+    record.prodId = prod_id
+    return record
+
+
+def write(directory, prod_ids, **kwargs) -> rei.ParquetSink:
+    sink = rei.ParquetSink(str(directory), batch_size=2, **kwargs)
+    for pid in prod_ids:
+        sink.write(product(pid), key=pid)
+    sink.close()
+    return sink
+
+
+def test_sku_rows_carry_prod_id(tmp_path):
+    write(tmp_path, ["1", "2", "3"])
+    skus = pq.read_table(str(tmp_path / "skus"))
+    assert sorted(set(skus.column("prodId").to_pylist())) == ["1", "2", "3"]
+    assert skus.num_rows == 6
+
+
+def test_parts_are_renamed_once_complete(tmp_path):
+    flushed = []
+    sink = write(tmp_path, ["1", "2", "3"], on_flush=flushed.append)
+    assert sink.parts == 2
+    assert flushed == [["1", "2"], ["3"]]
+    assert sorted(os.listdir(str(tmp_path / "products"))) == ["part-00000.parquet", "part-00001.parquet"]
+
+
+def test_resume_drops_unfinished_and_unrecorded_parts(tmp_path):
+    write(tmp_path, ["1", "2", "3", "4", "5", "6"])
+    # killed mid-write of part 3; part 2 was renamed but the checkpoint still says 2 parts
+    (tmp_path / "products" / "part-00003.parquet.tmp").write_bytes(b"PAR1")
+    sink = write(tmp_path, ["5", "6", "7"], mode="a", keep=2)
+    assert sink.parts == 4
+    products = pq.read_table(str(tmp_path / "products")).column("prodId").to_pylist()
+    assert sorted(products) == ["1", "2", "3", "4", "5", "6", "7"]
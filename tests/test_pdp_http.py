@@ -0,0 +1,99 @@
+"""HTTP PDP stage: modelData goes to the normalizer, and what HTTP cannot handle is left for the browser."""
+import json
+import os
+import sys
+from concurrent.futures import Future
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+MODEL_DATA = {"pageData": {"product": {"styleId": "style-ok", "title": "Tee", "skus": []}}}
+
+
+class Answer:
+    def __init__(self, status_code: int, text: str = "", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+        self.headers = headers or {}
+
+
+def page(model_data) -> str:
+    return f'<html><body><script type="application/json" id="modelData">{json.dumps(model_data)}</script></body></html>'
+
+
+ANSWERS = {
+    "ok": lambda: Answer(200, page(MODEL_DATA), {"ETag": '"v1"'}),
+    "blocked": lambda: Answer(403, "Access denied"),
+    "no-data": lambda: Answer(200, "<html><body>challenge</body></html>"),
+}
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, timeout=None, headers=None):
+        prod_id = url.rsplit("/", 1)[-1]
+        self.calls.append((prod_id, headers))
+        if prod_id not in ANSWERS:
+            raise requests.ConnectionError("connection reset")
+        return ANSWERS[prod_id]()
+
+
+class FakeTracker:
+    def __init__(self):
+        self.not_modified = []
+
+    def request_headers(self, prod_id):
+        return {"If-None-Match": '"v1"'} if prod_id == "ok" else None
+
+    def unchanged(self, prod_id, not_modified=False):
+        self.not_modified.append(prod_id)
+
+
+def test_only_usable_pdps_are_emitted(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(rei, "make_session", lambda **kwargs: session)
+    emitted = {}
+    handled, needs_browser = rei.scrape_pdps_http(["ok", "blocked", "no-data", "dead"],
+                                                  lambda pid, product: emitted.update({pid: product}),
+                                                  max_workers=2, limiter=rei.RateLimiter(rate=1000))
+    assert list(emitted) == ["ok"]
+    assert emitted["ok"].productName.endswith("Tee")
+    assert sorted(needs_browser) == ["blocked", "dead", "no-data"]
+    assert handled == 1
+
+
+def test_batch_sends_conditional_headers_and_skips_not_modified():
+    tracker = FakeTracker()
+    batch = rei.PdpBatch(["ok", "new"], tracker)
+    assert batch.headers("ok") == {"If-None-Match": '"v1"'}
+    assert batch.headers("new") is None
+
+    not_modified, fresh = Future(), Future()
+    not_modified.set_result(rei.PdpResponse(304, None))
+    fresh.set_result(rei.PdpResponse(200, "{}"))
+    assert batch.result("ok", not_modified) is None
+    assert batch.result("new", fresh) == rei.PdpResponse(200, "{}")
+    assert tracker.not_modified == ["ok"]
+    assert batch.outcome() == (2, [])
+
+
+def test_batch_sends_failed_fetches_to_the_browser():
+    batch = rei.PdpBatch(["dead"])
+    failed = Future()
+    failed.set_exception(requests.ConnectionError("connection reset"))
+    assert batch.result("dead", failed) is None
+    assert batch.outcome() == (0, ["dead"])
+
+
+def test_response_keeps_validators_and_drops_pages_without_model_data():
+    resp = rei.pdp_response(None, "ok", 200, page(MODEL_DATA), {"ETag": '"v1"', "Last-Modified": "Mon"})
+    assert json.loads(resp.json_text) == MODEL_DATA
+    assert (resp.etag, resp.last_modified) == ('"v1"', "Mon")
+    assert rei.pdp_response(None, "blocked", 403, "Access denied", {}) == rei.PdpResponse(403, None)
+    assert rei.pdp_response(None, "no-data", 200, "<html></html>", {}).json_text is None
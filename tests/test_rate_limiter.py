@@ -0,0 +1,66 @@
+"""RateLimiter: ceiling, additive increase, one multiplicative cut per cooldown, Retry-After pauses."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+def test_rate_above_default_ceiling_raises_it():
+    limiter = rei.RateLimiter(rate=50)
+    assert limiter.rate == 50
+    assert limiter.max_rate == 50
+
+
+def test_explicit_ceiling_clamps_the_start(capsys):
+    limiter = rei.RateLimiter(rate=50, max_rate=10)
+    assert limiter.rate == 10
+    assert "ceiling" in capsys.readouterr().out
+
+
+def test_healthy_responses_raise_the_rate_up_to_the_ceiling():
+    limiter = rei.RateLimiter(rate=4, max_rate=5)
+    limiter.record(200)
+    assert limiter.rate == pytest.approx(4 + rei.RATE_INCREASE / 4)
+    for _ in range(100):
+        limiter.record(200)
+    assert limiter.rate == 5
+
+
+def test_throttle_cuts_once_per_cooldown():
+    limiter = rei.RateLimiter(rate=8, cooldown=60)
+    limiter.record(429)
+    limiter.record(503)
+    assert limiter.rate == 8 * rei.RATE_DECREASE
+
+
+def test_cuts_stop_at_the_floor():
+    limiter = rei.RateLimiter(rate=1, min_rate=0.5, cooldown=0)
+    for _ in range(10):
+        limiter.record(429)
+    assert limiter.rate == 0.5
+
+
+def test_errors_do_not_change_the_rate():
+    limiter = rei.RateLimiter(rate=4)
+    for status in (404, 500, None):
+        limiter.record(status)
+    assert limiter.rate == 4
+
+
+def test_retry_after_pauses_the_bucket():
+    limiter = rei.RateLimiter(rate=100)
+    assert limiter.wait_time() == 0
+    limiter.record(429, "30")
+    assert 29 < limiter.wait_time() <= 30
+    assert limiter.snapshot()["paused_for"] > 29
+
+
+def test_burst_then_paced():
+    limiter = rei.RateLimiter(rate=0.5, burst=2)
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    assert limiter.wait_time() > 1
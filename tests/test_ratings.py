@@ -0,0 +1,52 @@
+"""extract_ratings with the per-template RatingsLocator: results must not depend on the order products arrive in."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def locator(monkeypatch):
+    fresh = rei.RatingsLocator()
+    monkeypatch.setattr(rei, "RATINGS_LOCATOR", fresh)
+    return fresh
+
+
+def no_summary():
+    """No reviewSummary anywhere; only the plain product-level fields."""
+    return {"pageData": {"product": {"reviews": {"averageRating": 4.5}, "reviewCount": 10}, "extra": {}}}
+
+
+def moved_summary(avg=3.9, count=12):
+    """Same template, summary at a path none of the known ones cover."""
+    return {"pageData": {"product": {"title": "Tee"},
+                         "extra": {"rv": {"reviewSummary": {"averageRating": avg, "count": count}}}}}
+
+
+def test_same_template_share_a_signature():
+    assert rei.RatingsLocator.signature(no_summary()) == rei.RatingsLocator.signature(moved_summary())
+
+
+def test_fallback_fields_survive_a_repeat():
+    assert rei.extract_ratings(no_summary())[:2] == (4.5, 10)
+    assert rei.extract_ratings(no_summary())[:2] == (4.5, 10)
+
+
+@pytest.mark.parametrize("first_missing", [True, False])
+def test_order_does_not_change_ratings(first_missing):
+    docs = [no_summary(), moved_summary()] if first_missing else [moved_summary(), no_summary()]
+    got = [rei.extract_ratings(d)[:2] for d in docs]
+    if not first_missing:
+        got.reverse()
+    assert got == [(4.5, 10), (3.9, 12)]
+
+
+def test_learned_path_is_reused_and_kept_after_a_miss(locator):
+    rei.extract_ratings(moved_summary())
+    rei.extract_ratings(no_summary())
+    assert rei.extract_ratings(moved_summary(4.1, 7))[:2] == (4.1, 7)
+    assert locator.paths[rei.RatingsLocator.signature(moved_summary())] == ("pageData", "extra", "rv", "reviewSummary")
@@ -0,0 +1,69 @@
+"""--refresh merge: listing fields applied to a stored record (listing_fields + apply_listing_fields)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+SOLD_OUT = rei.availability_label(1, 1, 0)
+IN_STOCK = rei.availability_label(1, 0, 1)
+PARTIAL = rei.availability_label(4, 1, 3)
+
+
+def stored(**overrides):
+    record = {"prodId": "1", "productId": "style-1", "productName": "Tee",
+              "price": {"regularPrice": 50.0, "salePriceRange": [30.0, 40.0], "isOnSale": True,
+                        "savingsPercentage": [20, 40]},
+              "ratings": {"averageRating": 4.2, "reviewCount": 9},
+              "availability": PARTIAL, "skus": [{"skuId": "a"}]}
+    record.update(overrides)
+    return record
+
+
+def merge(record, **item):
+    return rei.apply_listing_fields(record, rei.listing_fields(item))
+
+
+def test_sale_ended_clears_sale_fields():
+    updated, changed = merge(stored(), regularPrice=50.0, salePrice=50.0, sale=False)
+    assert changed
+    assert updated["price"] == {"regularPrice": 50.0, "isOnSale": False}
+
+
+def test_new_sale_and_rating_are_applied():
+    updated, _ = merge(stored(price={"regularPrice": 50.0, "isOnSale": False}), regularPrice=50.0,
+                       salePrice=35.0, percentageOff=30, rating=4.6, reviewCount=12)
+    assert updated["price"] == {"regularPrice": 50.0, "salePriceRange": [35.0, 35.0], "isOnSale": True,
+                                "savingsPercentage": [30]}
+    assert updated["ratings"] == {"averageRating": 4.6, "reviewCount": 12}
+
+
+def test_silent_listing_leaves_the_record_alone():
+    record = stored()
+    updated, changed = merge(record)
+    assert not changed
+    assert updated == record
+    assert list(updated)[-1] == "skus"
+
+
+def test_sold_out_listing_marks_the_record_unavailable():
+    updated, changed = merge(stored(), available=False)
+    assert changed and updated["availability"] == SOLD_OUT
+
+
+def test_back_in_stock_clears_unavailable():
+    updated, changed = merge(stored(availability=SOLD_OUT), available=True)
+    assert changed and updated["availability"] == IN_STOCK
+
+
+def test_available_keeps_a_partial_label():
+    updated, changed = merge(stored(), available=True)
+    assert not changed and updated["availability"] == PARTIAL
+
+
+def test_listing_hash_follows_the_merged_fields():
+    before = rei.listing_fields({"regularPrice": 50.0, "available": True})
+    after = rei.listing_fields({"regularPrice": 50.0, "available": False})
+    assert rei.hash_listing_fields(before) != rei.hash_listing_fields(after)
+    assert rei.hash_listing_fields(before) == rei.hash_listing_fields(dict(before))
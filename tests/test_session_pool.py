@@ -0,0 +1,88 @@
+"""SessionPool routing: transport errors move a request to another identity and bench a dead proxy."""
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+class Answer:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+
+def identity(name: str, answer) -> rei.Identity:
+    """An identity whose session answers with `answer()` (an Answer, or raises)."""
+    ident = rei.Identity(name, rate=1000)
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return answer()
+
+    ident.session.get = get
+    ident.calls = calls
+    return ident
+
+
+def dead():
+    raise requests.ConnectionError("proxy unreachable")
+
+
+def test_transport_error_moves_to_another_identity():
+    bad, good = identity("bad", dead), identity("good", lambda: Answer(200))
+    pool = rei.SessionPool([bad, good], bench_seconds=60)
+    for _ in range(40):
+        assert pool.get("http://rei.test/p").status_code == 200
+    assert bad.calls and len(good.calls) == 40
+
+
+def test_dead_proxy_is_benched():
+    bad = identity("bad", dead)
+    pool = rei.SessionPool([bad, identity("good", lambda: Answer(200))], bench_seconds=60)
+    for _ in range(rei.IDENTITY_BENCH_AFTER):
+        pool.report(bad, None)
+    assert bad.times_benched == 1
+    assert pool.pick().name == "good"
+
+
+def test_transport_error_is_raised_without_another_identity():
+    pool = rei.SessionPool([identity("only", dead)])
+    with pytest.raises(requests.ConnectionError):
+        pool.get("http://rei.test/p")
+
+
+def test_error_is_retried_once_only():
+    first, second = identity("a", dead), identity("b", dead)
+    pool = rei.SessionPool([first, second, identity("c", dead)])
+    with pytest.raises(requests.ConnectionError):
+        pool.get("http://rei.test/p")
+    assert len(first.calls) + len(second.calls) == 2
+
+
+def test_blocked_answer_switches_identity():
+    blocked, good = identity("blocked", lambda: Answer(403)), identity("good", lambda: Answer(200))
+    pool = rei.SessionPool([blocked, good], bench_seconds=60)
+    assert pool.get("http://rei.test/p").status_code == 200
+    assert len(blocked.calls) == 1
+    for _ in range(rei.IDENTITY_BENCH_AFTER - 1):
+        pool.report(blocked, 403)
+    assert blocked.times_benched == 1
+
+
+def test_success_resets_the_error_streak():
+    answers = iter([dead, dead, lambda: Answer(200), dead, dead])
+    flaky = identity("flaky", lambda: next(answers)())
+    pool = rei.SessionPool([flaky])
+    for expect_error in (True, True, False, True, True):
+        if expect_error:
+            with pytest.raises(requests.ConnectionError):
+                pool.get("http://rei.test/p")
+        else:
+            pool.get("http://rei.test/p")
+    assert flaky.times_benched == 0
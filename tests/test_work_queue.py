@@ -0,0 +1,85 @@
+"""WorkQueue against a temporary SQLite file: lease expiry, attempt limits and stale reports.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import REI_Product_Data_Scraper as rei  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path):
+    work_queue = rei.WorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    work_queue.reset()
+    yield work_queue
+    work_queue.close()
+
+
+def product(prod_id: str) -> rei.ProductRecord:
+    return rei.ProductRecord.from_dict({"prodId": prod_id, "productId": f"style-{prod_id}", "productName": "Tee",
+                                        "price": {"regularPrice": 25.0, "isOnSale": False}})
+
+
+def expire(work_queue: rei.WorkQueue, worker: str, size: int = 10) -> rei.Lease:
+    """Lease a batch and let the lease run out."""
+    lease = work_queue.lease(worker, size, timeout=0.01)
+    time.sleep(0.05)
+    return lease
+
+
+def test_expired_lease_is_requeued(queue):
+    queue.enqueue(["1", "2", "3"])
+    first = expire(queue, "w1")
+    assert queue.expire_leases() == 3
+    assert queue.counts()["queued"] == 3
+    second = queue.lease("w2", 10)
+    assert second.prod_ids == first.prod_ids
+    assert second.lease_id != first.lease_id
+
+
+def test_task_fails_once_attempts_are_used_up(queue):
+    queue.enqueue(["1"])
+    queue.seal()
+    for _ in range(2):
+        lease = queue.lease("w1", 10)
+        assert queue.complete(lease.lease_id, "w1", {}, lease.prod_ids) == 1
+    assert queue.counts()["failed"] == 1
+    assert queue.lease("w1", 10) is None
+    assert queue.finished() is not None
+
+
+def test_expiry_counts_as_an_attempt(queue):
+    queue.enqueue(["1"])
+    for _ in range(2):
+        expire(queue, "w1")
+        queue.expire_leases()
+    assert queue.counts()["failed"] == 1
+
+
+def test_late_complete_is_dropped(queue):
+    queue.enqueue(["1", "2"])
+    stale = expire(queue, "slow")
+    queue.expire_leases()
+    current = queue.lease("fast", 10)
+    assert queue.complete(stale.lease_id, "slow", {"1": product("1"), "2": product("2")}, []) == 0
+    assert queue.take_results() == []
+    assert queue.complete(current.lease_id, "fast", {"1": product("1")}, ["2"]) == 2
+    [(prod_id, record)] = queue.take_results()
+    assert prod_id == "1"
+    assert record.to_json() == product("1").to_json()
+
+
+def test_reset_starts_a_new_run(queue):
+    queue.seal()
+    finished = queue.finished()
+    assert finished is not None
+    queue.reset()
+    assert queue.finished() is None
+    queue.seal()
+    assert queue.finished() not in (None, finished)